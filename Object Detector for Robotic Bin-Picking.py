@@ -1,27 +1,88 @@
+import time
+STARTED = time.perf_counter()  # Startup is timed from here, before the imports below
+import argparse
 import tkinter as tk
 from tkinter import ttk, filedialog
 from tkinter.scrolledtext import ScrolledText  
 import os
 import cv2
-from ultralytics import YOLO
-from PIL import Image, ImageTk
 import json
+from camera_probe import CameraCatalog
+from camera_streams import CameraStream, tile_layout
+from change_gate import ChangeGate
+from detection_log import DetectionLog
+from detections import class_names, to_numpy, to_records
+from frame_recorder import REPLAY_API, FrameRecorder, ReplaySource
+from image_writer import ImageWriter
+from inference_backends import BACKENDS, resolve_weight_path
+from inference_worker import InferenceWorker
+import metrics
+from model_registry import ModelRegistry
+from pick_planner import plan_picks, picks_to_records
+from preview import PreviewRenderer
+from roi_tiling import RoiTiler, parse_roi
+IMPORTED = time.perf_counter()
 
 class CameraApp:
-    def __init__(self, root):
+    def __init__(self, root, weight_path=None, metrics_port=None, tiler=None, capture_size=(1280, 720), record_slots=200):
         self.root = root
         self.root.title("Object Detector for Robotic Bin-Picking")
 
         # Initialize variables
         self.image_path = None  # Variable to store the image path
+        self.current_frame = None  # BGR ndarray of the image being shown, kept in memory
+        self.image_id = None  # Identifier of the current frame in the detection log
+        self.current_recording = {}  # Recorder and frame number of the current frame, while recording
         self.inferencing = False
-        self.model = YOLO("weights\\bestV3-OBB.pt")
-        self.current_weight_path = "weights\\bestV3-OBB.pt"  # Default weight path
+        self.current_weight_path = resolve_weight_path(weight_path)  # --weights, $BINPICK_WEIGHTS or the default
+        self.model_registry = ModelRegistry(max_models=3)  # Loaded weights, reused when switching back
+        self.backend = "torch"  # Inference runtime, see inference_backends
+        self.model = None  # Loaded in the background once the window is up
+        self.pending_weight_path = None  # Weight being loaded in the background
+        self.class_names = class_names([])  # Class id -> name table of the loaded weight
         self.selected_camera = None  # Variable to store selected camera
-        self.cap = None  # VideoCapture object
+        self.capture = None  # Background capture thread of the selected camera
+        self.streams = []  # CameraStream per open camera, in preview tile order
+        # Last probe result, refreshed in the background; kept next to the script so any working folder works
+        self.camera_catalog = CameraCatalog(cache_file=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    ".camera_cache.json"))
+        self.camera_list = self.camera_catalog.cameras  # CameraInfo per combobox entry
+        self.detection_log = DetectionLog("hasil.jsonl")  # Append-only per-frame detection log
+        self.image_writer = ImageWriter(codec=".png")  # Optional lossless copy of grabbed frames
+        self.capture_dir = "captures"
+        self.capture_size = capture_size  # Camera resolution requested when grabbing
+        self.record_dir = "recordings"
+        self.record_slots = record_slots  # Frames kept per camera recording before the oldest are overwritten
+
+        # Inference runs on a worker thread; results are picked up by poll_inference on the Tk thread.
+        # Frames of several cameras are batched into one model call. With a tiler the model only sees
+        # the bin's ROI, optionally in tiles, so small parts keep their pixels at high resolutions
+        # The change gate answers unchanged frames from the last detections instead of running the model
+        self.change_gate = ChangeGate()
+        self.inference_worker = InferenceWorker(self.model, self.current_weight_path, conf=0.8, max_batch=4, tiler=tiler,
+                                                gate=self.change_gate)
+        self.latest_job_id = None  # Most recent job submitted for the shown image
+
+        # Live mode: continuous preview of every open camera with rate-limited detection
+        self.live = False
+        self.live_job = None  # Pending root.after callback of the live loop
+
+        # Optional Prometheus endpoint; serving metrics also switches the timing hooks on
+        self.metrics_server = None
+        if metrics_port is not None:
+            metrics.registry.enabled = True
+            self.metrics_server = metrics.MetricsServer(metrics.registry, port=metrics_port)
+            self.metrics_server.start()
 
         # Create UI
         self.create_ui()
+        self.root.after(15, self.poll_inference)
+        self.refresh_cameras()
+        if os.path.exists(self.current_weight_path):
+            self.load_weight(self.current_weight_path, self.backend)
+        else:
+            print(f"Weight {self.current_weight_path} not found, select one with Browse Weight")
+            self.weight_label.config(text=f"Weight not found: {self.current_weight_path}")
 
     def create_ui(self):
         top_frame = tk.Frame(self.root)
@@ -32,17 +93,35 @@ class CameraApp:
         self.select_image_button.pack(side=tk.LEFT, padx=5)
 
         # Combobox to select a camera
-        self.camera_combobox = ttk.Combobox(top_frame, values=self.get_available_cameras())
+        self.camera_combobox = ttk.Combobox(top_frame, values=self.camera_labels(self.camera_list), state="readonly")
         self.camera_combobox.pack(side=tk.LEFT, padx=5)
         self.camera_combobox.bind("<<ComboboxSelected>>", self.on_camera_select)
 
+        # Button to probe the cameras again
+        self.refresh_button = tk.Button(top_frame, text="Refresh", command=self.refresh_cameras)
+        self.refresh_button.pack(side=tk.LEFT, padx=5)
+
+        # Button to open every listed camera at once
+        self.open_all_button = tk.Button(top_frame, text="Open All", command=self.open_all_cameras)
+        self.open_all_button.pack(side=tk.LEFT, padx=5)
+
+        # Button to open a frame recording as if it were a camera
+        self.replay_button = tk.Button(top_frame, text="Replay", command=self.open_replay)
+        self.replay_button.pack(side=tk.LEFT, padx=5)
+
         # Button to take a picture from selected camera
         self.capture_button = tk.Button(top_frame, text="Grab Camera", command=self.capture_image)
         self.capture_button.pack(side=tk.LEFT, padx=5)
 
+        # Checkbox to also write grabbed frames to disk (in the background)
+        self.save_captures = tk.BooleanVar(value=False)
+        self.save_captures_check = tk.Checkbutton(top_frame, text="Save captures", variable=self.save_captures)
+        self.save_captures_check.pack(side=tk.LEFT, padx=5)
+
         # Canvas to show the image
         self.canvas = tk.Canvas(self.root, width=640, height=360)  # Adjusted to 16:9 aspect ratio
         self.canvas.pack(side=tk.LEFT, padx=5, pady=5)
+        self.preview = PreviewRenderer(self.canvas, 640, 360)  # Single canvas image updated in place
 
         # Add a frame for the right-side JSON preview box
         right_frame = tk.Frame(self.root)
@@ -52,6 +131,17 @@ class CameraApp:
         self.json_preview = ScrolledText(right_frame, wrap=tk.WORD, width=40, height=22)
         self.json_preview.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
+        # Stage timings (p50/p95) while metrics are enabled
+        self.metrics_enabled = tk.BooleanVar(value=metrics.registry.enabled)
+        self.metrics_check = tk.Checkbutton(right_frame, text="Metrics", variable=self.metrics_enabled,
+                                            command=self.toggle_metrics)
+        self.metrics_check.pack(side=tk.TOP, anchor=tk.W)
+        self.metrics_label = tk.Label(right_frame, text="", font=("Courier", 8), justify=tk.LEFT, anchor=tk.W)
+        self.metrics_label.pack(side=tk.TOP, fill=tk.X)
+        self.metrics_job = None  # Pending root.after callback of the metrics panel
+        if metrics.registry.enabled:
+            self.update_metrics_panel()
+
         # Button to start/stop inference
         self.control_button = tk.Button(top_frame, text="Start Detection", command=self.toggle_inference)
         self.control_button.pack(side=tk.LEFT, padx=5)
@@ -60,31 +150,79 @@ class CameraApp:
         self.select_weight_button = tk.Button(top_frame, text="Browse Weight", command=self.select_weight)
         self.select_weight_button.pack(side=tk.LEFT, padx=5)
 
+        # Combobox to select the inference backend
+        self.backend_combobox = ttk.Combobox(top_frame, values=BACKENDS, state="readonly", width=9)
+        self.backend_combobox.set(self.backend)
+        self.backend_combobox.pack(side=tk.LEFT, padx=5)
+        self.backend_combobox.bind("<<ComboboxSelected>>", self.on_backend_select)
+
         # Label to display current weight path
         self.weight_label = tk.Label(top_frame, text=f"Current Weight: {self.current_weight_path}")
         self.weight_label.pack(side=tk.LEFT, padx=5)
 
-    def get_available_cameras(self, num_camera = 5):
-        # Check for available cameras by attempting to open them
-        cameras = []
-        for i in range(num_camera):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)  
-            if cap.isOpened():
-                # # Get the width and height of the camera
-                # cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                # cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-                # width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                # height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-                # Append camera info to the list
-                cameras.append(f"Camera {i}")
-                print(f"Camera {i}")
-                # print(f"Camera {i}: {width}x{height}")  
-                
-                cap.release()
-        return cameras
-
+        # Shown while a weight is loading (no progress is reported, so it just runs)
+        self.weight_progress = ttk.Progressbar(top_frame, mode="indeterminate", length=80)
+
+        # Second row: live mode controls and counters
+        live_frame = tk.Frame(self.root)
+        live_frame.pack(side=tk.TOP, fill=tk.X, before=self.canvas)
+
+        self.live_button = tk.Button(live_frame, text="Start Live", command=self.toggle_live)
+        self.live_button.pack(side=tk.LEFT, padx=5)
+
+        # Target detection rate in live mode
+        tk.Label(live_frame, text="Detections/s").pack(side=tk.LEFT)
+        self.target_rate = tk.DoubleVar(value=5.0)
+        self.target_rate_spinbox = tk.Spinbox(live_frame, from_=0.5, to=30, increment=0.5, width=5,
+                                              textvariable=self.target_rate)
+        self.target_rate_spinbox.pack(side=tk.LEFT, padx=5)
+
+        # Reuse detections for frames that did not change since the last inference
+        self.skip_unchanged = tk.BooleanVar(value=True)
+        self.skip_unchanged_check = tk.Checkbutton(live_frame, text="Skip unchanged frames", variable=self.skip_unchanged,
+                                                   command=self.toggle_change_gate)
+        self.skip_unchanged_check.pack(side=tk.LEFT, padx=5)
+
+        # Keep the frames sent to detection in a ring file per camera, linked from the log records
+        self.recording = tk.BooleanVar(value=False)
+        self.record_check = tk.Checkbutton(live_frame, text="Record", variable=self.recording,
+                                           command=self.toggle_recording)
+        self.record_check.pack(side=tk.LEFT, padx=5)
+
+        self.live_stats_label = tk.Label(live_frame, text="")
+        self.live_stats_label.pack(side=tk.LEFT, padx=5)
+
+    def camera_labels(self, cameras):
+        # Combobox entries, in the same order as the catalog's camera list
+        labels = []
+        for info in cameras:
+            if info.reads:
+                labels.append(f"Camera {info.index} ({info.resolution[0]}x{info.resolution[1]})")
+            else:
+                labels.append(f"Camera {info.index} (no frames)")
+        return labels
+
+    def refresh_cameras(self):
+        # Probe devices in the background; poll_cameras fills the combobox when done
+        self.refresh_button.config(state=tk.DISABLED)
+        self.camera_catalog.refresh()
+        self.root.after(100, self.poll_cameras)
+
+    def poll_cameras(self):
+        cameras = self.camera_catalog.poll()
+        if cameras is None:
+            self.root.after(100, self.poll_cameras)
+            return
+
+        # An open camera can fail a probe because it is busy; keep it listed
+        missing = [stream.info for stream in self.streams
+                   if stream.info.api != REPLAY_API and all(info.index != stream.index for info in cameras)]
+        if missing:
+            cameras = sorted(cameras + missing)
+            self.camera_catalog.cameras = cameras
+        self.camera_list = cameras
+        self.camera_combobox.config(values=self.camera_labels(cameras))
+        self.refresh_button.config(state=tk.NORMAL)
 
     def on_camera_select(self, event):
         # Set selected camera based on Combobox selection
@@ -93,74 +231,307 @@ class CameraApp:
             # Release the previously selected camera (if any)
             self.release_camera()
 
-            # Extract camera port from the selected camera
-            self.selected_camera = self.camera_combobox.get().split()[-1]
+            # Camera port and capture backend of the selected camera
+            info = self.camera_list[selected_index]
+            self.selected_camera = str(info.index)
             print(f"Selected Camera: {self.selected_camera}")
 
-            # Open the selected camera
-            self.cap = cv2.VideoCapture(int(self.selected_camera), cv2.CAP_DSHOW)
+            # Open the selected camera on its own capture thread
+            self.open_cameras([info])
+
+    def open_all_cameras(self):
+        # Every camera that delivered frames in the last probe, e.g. all views of one bin
+        cameras = [info for info in self.camera_list if info.reads]
+        if not cameras:
+            print("No cameras available")
+            return
+        self.release_camera()
+        self.camera_combobox.set('')
+        self.selected_camera = str(cameras[0].index)
+        self.open_cameras(cameras)
+
+    def open_replay(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Frame recordings", "*.frames")])
+        if not file_path:
+            return
+        try:
+            source = ReplaySource(file_path, speed=1.0, loop=True)
+        except (OSError, ValueError) as exc:
+            print(f"Unable to open recording {file_path}: {exc}")
+            return
+        self.release_camera()
+        self.camera_combobox.set('')
+        info = source.recording.camera_info()
+        self.selected_camera = str(info.index)
+        print(f"Replaying {file_path} ({len(source.recording)} frames)")
+        self.open_cameras([info], captures=[source])
 
-            # Optionally check if the camera opened successfully
-            if not self.cap.isOpened():
-                print(f"Error: Unable to open camera {self.selected_camera}")
+    def open_cameras(self, cameras, timeout=5.0, captures=None):
+        """
+        Open each camera on its own capture thread. A single camera uses the whole canvas and the
+        main detection log; several cameras get a tile of the canvas and a log file each.
+        The first camera is the one "Grab Camera" takes pictures from. `captures` optionally gives
+        a ready capture source per camera (e.g. a ReplaySource).
+        """
+        layout = tile_layout(len(cameras), self.preview.width, self.preview.height)
+        if len(cameras) > 1:
+            self.preview.clear()
+        captures = captures or [None] * len(cameras)
+        for info, capture, (x, y, width, height) in zip(cameras, captures, layout):
+            if len(cameras) == 1:
+                preview, log = self.preview, self.detection_log
             else:
-                print(f"Camera {self.selected_camera} opened successfully")
-
-    def capture_image(self, width=1280, height=720):
-        if self.cap:
-            # Set the resolution
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-
-            ret, frame = self.cap.read()
-            if ret:
-                self.image_path = "captured_image.jpg"
-                print('Image saved with resolution:', width, 'x', height)
-                cv2.imwrite(self.image_path, frame)  # Save the captured image
+                preview = PreviewRenderer(self.canvas, width, height, x=x, y=y)
+                log = DetectionLog(f"hasil_cam{info.index}.jsonl")
+            self.streams.append(CameraStream(info, preview, log, *self.capture_size, capture=capture))
+
+        # Started together so slow drivers open in parallel
+        for stream in self.streams:
+            stream.start(timeout=0)
+        deadline = time.monotonic() + timeout
+        for stream in self.streams:
+            if stream.capture.wait_opened(max(0.0, deadline - time.monotonic())):
+                print(f"Camera {stream.index} opened successfully")
+            else:
+                print(f"Error: Unable to open camera {stream.index}")
+        self.capture = self.streams[0].capture if self.streams else None
+        if self.recording.get():
+            self.start_recording()
+
+    def toggle_recording(self):
+        if self.recording.get():
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self):
+        width, height = self.capture_size
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        for stream in self.streams:
+            if stream.recorder is None and stream.info.api != REPLAY_API:
+                path = os.path.join(self.record_dir, f"cam{stream.index}_{stamp}.frames")
+                # Preallocated for the requested resolution; larger frames are skipped
+                stream.recorder = FrameRecorder(path, self.record_slots, (height, width, 3), camera=stream.index)
+                print(f"Recording camera {stream.index} to {path}")
+
+    def stop_recording(self):
+        for stream in self.streams:
+            if stream.recorder is not None:
+                stream.recorder.close()
+                stream.recorder = None
+
+    def record_frame(self, stream, frame, image_id):
+        # Returns the meta that links the detection result back to the recorded frame
+        if stream.recorder is None:
+            return {}
+        number = stream.recorder.record(frame.image, frame.timestamp, image_id)
+        return {"recorder": stream.recorder, "recorded_frame": number} if number is not None else {}
+
+    def capture_image(self):
+        if self.capture and self.capture.is_opened():
+            # Only renegotiated by the capture thread when the size changes
+            self.capture.set_resolution(*self.capture_size)
+
+            with metrics.timed("capture"):
+                frame = self.capture.latest()  # Newest frame in the ring buffer, no waiting
+            if frame is not None:
+                if self.streams[0].info.api != REPLAY_API:  # Replayed frames carry their recorded time
+                    metrics.observe("frame_age", time.time() - frame.timestamp)
+                self.image_id = self.streams[0].image_id(frame)
+                self.image_path = None
+                self.current_frame = frame.image  # Goes straight to inference and display
+                height, width = frame.image.shape[:2]
+                print('Image captured with resolution:', width, 'x', height)
+
+                if self.save_captures.get():
+                    # Encoded and written on the writer thread
+                    self.image_path = self.image_writer.save(frame.image, os.path.join(self.capture_dir, self.image_id))
+                self.current_recording = self.record_frame(self.streams[0], frame, self.image_id)
                 self.display_image()  # Display the captured image on the canvas
             else:
                 print("Failed to capture image")
         else:
             print("No camera is currently open")
 
+    def toggle_live(self):
+        if self.live:
+            self.stop_live()
+            return
+        if not any(stream.capture.is_opened() for stream in self.streams):
+            print("No camera is currently open")
+            return
+
+        self.live = True
+        for stream in self.streams:
+            stream.reset()
+            stream.preview.lift()
+        self.live_button.config(text="Stop Live")
+        self.live_loop()
+
+    def stop_live(self):
+        self.live = False
+        if self.live_job:
+            self.root.after_cancel(self.live_job)
+            self.live_job = None
+        self.live_button.config(text="Start Live")
+
+    def live_loop(self):
+        """
+        Show the newest frame of every open camera and send frames to detection when the target
+        rate allows. Runs on the Tk thread via root.after.
+        """
+        if not (self.live and self.streams):
+            self.stop_live()
+            return
+
+        now = time.monotonic()
+        interval = 1.0 / max(self.get_target_rate(), 0.1)
+        for stream in self.streams:
+            self.update_stream(stream, now, interval)
+
+        capture_rate = sum(stream.capture_meter.rate() for stream in self.streams)
+        inference_rate = sum(stream.inference_meter.rate() for stream in self.streams)
+        dropped = sum(stream.dropped for stream in self.streams)
+        self.live_stats_label.config(
+            text=f"Cameras {len(self.streams)} | Capture {capture_rate:.1f} fps | Inference {inference_rate:.1f} fps"
+                 f" | Dropped {dropped}")
+        self.live_job = self.root.after(5, self.live_loop)
+
+    def update_stream(self, stream, now, interval):
+        frame = stream.capture.latest()
+        if frame is None or frame.index == stream.last_frame:
+            return
+        stream.capture_meter.tick(frame.index - stream.last_frame if stream.last_frame >= 0 else 1)
+        stream.last_frame = frame.index
+        if stream.info.api != REPLAY_API:  # Replayed frames carry their recorded time
+            metrics.observe("frame_age", time.time() - frame.timestamp)
+        if stream.capture is self.capture:
+            self.current_frame = frame.image
+            self.image_path = None
+
+        dets = None
+        if self.inferencing:
+            if now >= stream.next_inference_due:
+                # One slot per camera in the worker; due frames of all cameras run as one batch
+                if self.inference_worker.is_idle(stream.key):
+                    image_id = stream.image_id(frame)
+                    stream.latest_job_id = self.inference_worker.submit(
+                        frame.image, key=stream.key, image_id=image_id, image_path=None,
+                        timestamp=frame.timestamp, **self.record_frame(stream, frame, image_id))
+                    stream.next_inference_due = now + interval
+                else:
+                    stream.dropped += 1  # Inference is behind; skip instead of queueing
+                    metrics.increment("frames_dropped")
+            # Last detections, moved along with the parts
+            dets = stream.tracker.predict(frame.timestamp)
+        with metrics.timed("preview"):
+            stream.preview.render(frame.image, dets, self.class_names)
+
+    def toggle_change_gate(self):
+        # The cache may be stale after running without the gate
+        self.change_gate.invalidate()
+        self.inference_worker.gate = self.change_gate if self.skip_unchanged.get() else None
+
+    def get_target_rate(self):
+        try:
+            return float(self.target_rate.get())
+        except (tk.TclError, ValueError):
+            return 5.0  # Spinbox holds an incomplete number while the user types
+
 
     def select_image(self):
         # Open a file dialog to select an image
         file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
         if file_path:
             # If the camera is active, stop it before displaying the selected image
-            if self.cap and self.cap.isOpened():
+            if self.streams:
                 self.release_camera()
                 self.camera_combobox.set('')  # Clear the camera combobox
 
+            image = cv2.imread(file_path)
+            if image is None:
+                print(f"Failed to read image {file_path}")
+                return
             self.image_path = file_path
+            self.image_id = file_path
+            self.current_recording = {}
+            self.current_frame = image  # Decoded once, reused on every redraw
             self.display_image()  # Display the selected image on the canvas
 
 
     def display_image(self):
-        if self.image_path:
-            image = cv2.imread(self.image_path)
+        if self.live:
+            return  # The live loop keeps the canvas and detections up to date
+        if self.current_frame is not None:
+            # Show the raw frame right away; the annotated one replaces it when inference is done
+            self.show_frame(self.current_frame)
 
             if self.inferencing:
-                # Run YOLO inference and annotate the image
-                results = self.model(image, conf=0.8)
-                annotated_frame = results[0].plot()
-                self.save_inference_to_json(results)
+                # A newer frame replaces any job the worker has not started yet; before the
+                # first weight is loaded the job waits for it
+                self.latest_job_id = self.inference_worker.submit(
+                    self.current_frame, image_id=self.image_id, image_path=self.image_path,
+                    **self.current_recording)
+                self.json_preview.delete(1.0, tk.END)
+                self.json_preview.insert(tk.END, "Running detection..." if self.model is not None
+                                         else "Waiting for the weight to load...")
+
+    def poll_inference(self):
+        """
+        Hand finished inference jobs over to the widgets. Runs on the Tk thread via root.after.
+        """
+        streams = {stream.key: stream for stream in self.streams}
+        for result in self.inference_worker.poll():
+            # Live results are routed back to their camera by the job key
+            stream = streams.get(result.key)
+            latest_job_id = stream.latest_job_id if stream is not None else self.latest_job_id
+            if result.job_id != latest_job_id or not self.inferencing:
+                continue  # A newer frame was submitted or detection was switched off meanwhile
+            if result.error is not None:
+                print(f"Inference failed: {result.error}")
+                metrics.increment("inference_errors")
+                continue
+            if stream is not None:
+                # Capture to result, the delay the robot actually sees (not measurable on a replay)
+                if stream.info.api != REPLAY_API:
+                    metrics.observe("end_to_end", time.time() - result.meta["timestamp"])
+                # The live loop draws the tracked boxes on the camera's following frames
+                stream.tracker.update(result.dets, result.meta["timestamp"])
+                stream.inference_meter.tick()
             else:
-                annotated_frame = image
-
-            # Resize the image directly to fit the canvas size 
-            resized_image = cv2.resize(annotated_frame, (640, 360))
-
-            # Convert the resized frame to a format suitable for Tkinter
-            rgb_frame = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb_frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Display the image on the canvas
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
-            self.canvas.image = imgtk
-
+                self.show_frame(result.frame, result.dets, result.names)
+            self.save_inference_to_json(result.results, dets=result.dets, image_id=result.meta["image_id"],
+                                        image_path=result.meta["image_path"], weight_path=result.weight_path,
+                                        names=result.names, log=stream.log if stream is not None else None,
+                                        recorder=result.meta.get("recorder"),
+                                        recorded_frame=result.meta.get("recorded_frame"))
+        self.root.after(15, self.poll_inference)
+
+    def toggle_metrics(self):
+        metrics.registry.enabled = self.metrics_enabled.get()
+        # Restart the refresh loop, so a quick off/on toggle does not leave two of them running
+        if self.metrics_job:
+            self.root.after_cancel(self.metrics_job)
+            self.metrics_job = None
+        self.update_metrics_panel()
+
+    def update_metrics_panel(self):
+        self.metrics_job = None
+        if not metrics.registry.enabled:
+            self.metrics_label.config(text="")
+            return
+        lines = [f"{'stage':<13}{'p50 ms':>8}{'p95 ms':>8}{'n':>7}"]
+        for name, histogram in metrics.registry.stages():
+            p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+            lines.append(f"{name:<13}{p50 * 1000:8.1f}{p95 * 1000:8.1f}{histogram.count:7d}")
+        self.metrics_label.config(text="\n".join(lines))
+        self.metrics_job = self.root.after(1000, self.update_metrics_panel)
+
+    def show_frame(self, frame, dets=None, names=None):
+        # Resized into the renderer's reused buffer, boxes drawn at preview scale
+        self.preview.lift()  # Camera tiles may be covering it
+        with metrics.timed("preview"):
+            self.preview.render(frame, dets, names, force=True)
 
     def toggle_inference(self):
         # Toggle the inference state
@@ -172,51 +543,91 @@ class CameraApp:
         # Open a file dialog to select a weight file
         file_path = filedialog.askopenfilename(filetypes=[("PyTorch Model Files", "*.pt")])
         if file_path:
-            self.current_weight_path = file_path
-            self.model = YOLO(file_path)  # Load the selected model file
-            self.weight_label.config(text=f"Current Weight: {self.current_weight_path}")
-
-    def save_inference_to_json(self, results, output_file="hasil.json"):
+            self.load_weight(file_path, self.backend)
+
+    def on_backend_select(self, event):
+        # Reload the current weight on the selected runtime (exported and cached on first use)
+        backend = self.backend_combobox.get()
+        if backend != self.backend:
+            self.load_weight(self.current_weight_path, backend)
+
+    def load_weight(self, file_path, backend):
+        # Loaded and warmed up in the background (or taken from the cache); the current
+        # model keeps serving until the new one is ready
+        self.pending_weight_path = file_path
+        self.weight_label.config(text=f"Loading Weight: {file_path} ({backend})")
+        self.weight_progress.pack(side=tk.LEFT, padx=5)
+        self.weight_progress.start(15)
+        self.poll_weight_load(self.model_registry.load(file_path, backend), file_path, backend)
+
+    def poll_weight_load(self, future, file_path, backend):
+        if file_path != self.pending_weight_path:
+            return  # Superseded by a later selection
+        if not future.done():
+            stage = self.model_registry.stage(file_path, backend)
+            self.weight_label.config(text=f"Loading Weight: {file_path} ({backend}" + (f", {stage})" if stage else ")"))
+            self.root.after(50, self.poll_weight_load, future, file_path, backend)
+            return
+
+        self.pending_weight_path = None
+        self.weight_progress.stop()
+        self.weight_progress.pack_forget()
+        error = future.exception()
+        if error is not None:
+            print(f"Failed to load weight {file_path} on {backend}: {error}")
+            # A missing or broken weight leaves the app usable; the previous model (if any) stays
+            self.weight_label.config(text=f"Current Weight: {self.current_weight_path}" if self.model is not None
+                                     else f"No weight loaded: {os.path.basename(file_path)} failed")
+            self.backend_combobox.set(self.backend)
+            return
+
+        if self.model is None:
+            print(f"First weight ready {time.perf_counter() - STARTED:.2f} s after start")
+            metrics.observe("startup_model", time.perf_counter() - STARTED)
+        # Swap everything that depends on the weight at once, on the Tk thread
+        self.model = future.result()
+        self.current_weight_path = file_path
+        self.backend = backend
+        self.class_names = class_names(self.model.names)
+        self.inference_worker.set_model(self.model, file_path)
+        for stream in self.streams:
+            stream.tracker.reset()  # Tracks of the old weight's classes no longer apply
+        self.weight_label.config(text=f"Current Weight: {self.current_weight_path}")
+
+    def save_inference_to_json(self, results, dets=None, image_id=None, image_path=None, weight_path=None, names=None,
+                               log=None, recorder=None, recorded_frame=None):
         """
-        Save YOLO inference results to a JSON file in xywhr format, only if OBB values are found.
-        Also display the JSON output in the preview box.
+        Append YOLO inference results to the detection log (or a camera's own `log`) in xywhr format,
+        only if OBB values are found. Also display the JSON output in the preview box.
+        Frames taken from a `recorder` are linked both ways: the record names the recording file and
+        frame number, and the recording keeps the record's byte offset in the log.
         """
-        inference_data = []
-        # inference_data.append({"image_path": self.image_path})
-
-        for result in results:
-            if result.obb is not None and len(result.obb.conf) > 0:
-                for i in range(len(result.obb.conf)):
-                    class_name = self.model.names[int(result.obb.cls[i])]
-                    inference_data.append({
-                        "x": float(result.obb.xywhr[i, 0]),
-                        "y": float(result.obb.xywhr[i, 1]),
-                        "w": float(result.obb.xywhr[i, 2]),
-                        "h": float(result.obb.xywhr[i, 3]),
-                        "r": float(result.obb.xywhr[i, 4]),
-                        "confidence": float(result.obb.conf[i]),
-                        "class": class_name
-                    })
+        log = self.detection_log if log is None else log
+        # Bulk host transfer of the box tensors, class names precomputed per weight load
+        names = self.class_names if names is None else names
+        dets = to_numpy(results) if dets is None else dets
+        inference_data = to_records(dets, names)
 
         # Display the JSON output in the preview box
         self.json_preview.delete(1.0, tk.END)  # Clear the preview box
-        if result.obb is not None and len(result.obb.conf) > 0:
-            json_output = json.dumps(inference_data, indent=4)
-            self.json_preview.insert(tk.END, json_output)  # Insert new JSON data into the box
-
-            # Append to the file if it exists
-            if os.path.exists(output_file):
-                with open(output_file, "r") as json_file:
-                    existing_data = json.load(json_file)
-                existing_data.extend(inference_data[1:])  # Skip the first element (image path)
-                with open(output_file, "w") as json_file:
-                    json.dump(existing_data, json_file, indent=4)
-                print(f"Inference results appended to {output_file}")
-            else:
-                # Create a new file if it doesn't exist
-                with open(output_file, "w") as json_file:
-                    json.dump(inference_data, json_file, indent=4)
-                print(f"Inference results saved to {output_file}")
+        if inference_data:
+            with metrics.timed("json_preview"):
+                json_output = json.dumps(inference_data, indent=4)
+                self.json_preview.insert(tk.END, json_output)  # Insert new JSON data into the box
+
+            # One compact record per frame, appended without touching earlier frames
+            # Ranked pick targets travel with the detections so the controller does not re-sort them
+            with metrics.timed("picks"):
+                picks = picks_to_records(plan_picks(dets), dets, names)
+            extra = {}
+            if recorder is not None and recorded_frame is not None:
+                extra["recording"] = {"file": recorder.path, "frame": recorded_frame}
+            with metrics.timed("save"):
+                log.append(inference_data, image_id=image_id, weight_path=weight_path or self.current_weight_path,
+                           image_path=image_path, picks=picks, **extra)
+            if extra:
+                recorder.set_log_offset(recorded_frame, log.last_offset)
+            print(f"Inference results appended to {log.path}")
         else:
             self.json_preview.insert(tk.END, "Nothing Detected or its not in OBB format!.")  # Display a message in the preview box
             print("No OBB data found. Skipping saving to JSON.")
@@ -225,19 +636,55 @@ class CameraApp:
         """
         Release Camera so that it doesnt get LOCKED forever
         """    
-        if self.cap:
-            self.cap.release()
+        self.stop_live()
+        for stream in self.streams:
+            stream.close()
+            # Tiles and per-camera logs belong to the stream; the full-canvas preview and main log stay
+            if stream.preview is not self.preview:
+                stream.preview.close()
+            if stream.log is not self.detection_log:
+                stream.log.close()
+        if self.streams:
             print('camera released due to switching or manual input given!')
+        self.streams = []
+        self.capture = None
+
+    def report_startup(self):
+        # Runs once the window is up; the weight is usually still loading at this point
+        now = time.perf_counter()
+        print(f"Imports took {IMPORTED - STARTED:.2f} s, window ready {now - STARTED:.2f} s after start")
+        metrics.observe("startup_imports", IMPORTED - STARTED)
+        metrics.observe("startup_window", now - STARTED)
 
     def on_close(self):
         self.release_camera()
+        self.inference_worker.stop()
+        self.detection_log.close()
+        self.model_registry.close()
+        self.image_writer.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Object Detector for Robotic Bin-Picking")
+    parser.add_argument("--weights", help="YOLO OBB weight file (default: $BINPICK_WEIGHTS or weights/bestV3-OBB.pt)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--resolution", default="1280x720", help="Camera resolution, WIDTHxHEIGHT")
+    parser.add_argument("--roi", type=parse_roi, help="Only detect inside x,y,w,h (frame pixels)")
+    parser.add_argument("--tile", type=int, help="Split the ROI into overlapping tiles of this size (pixels)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="Fraction of a tile shared with its neighbours")
+    parser.add_argument("--record-slots", type=int, default=200, help="Frames kept per camera when recording")
+    args = parser.parse_args()
+
     root = tk.Tk()
     width = 1050
     height = 450
     root.geometry(f"{width}x{height}") 
-    app = CameraApp(root)
+    tiler = RoiTiler(args.roi, args.tile, args.tile_overlap) if args.roi or args.tile else None
+    capture_size = tuple(int(v) for v in args.resolution.lower().split("x"))
+    app = CameraApp(root, weight_path=args.weights, metrics_port=args.metrics_port, tiler=tiler, capture_size=capture_size,
+                    record_slots=args.record_slots)
     root.protocol("WM_DELETE_WINDOW", app.on_close)
+    root.after_idle(app.report_startup)
     root.mainloop()
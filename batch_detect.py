@@ -0,0 +1,177 @@
+"""
+Headless batch detection over a folder of images or a video file.
+
+Example:
+    python batch_detect.py archive/2024-10-01 --weights weights/bestV3-OBB.pt --batch 8 --output archive.jsonl
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from detection_log import DetectionLog
+from detections import class_names, to_numpy, to_records
+from inference_backends import BACKENDS, DEFAULT_WEIGHT_PATH, load_model, resolve_weight_path
+from roi_tiling import RoiTiler, parse_roi
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def iter_image_files(directory):
+    # Sorted so reruns over the same archive produce the same record order
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.join(directory, name)
+
+
+def iter_video_frames(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video {path}")
+    try:
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield f"{path}#{index}", frame
+            index += 1
+    finally:
+        cap.release()
+
+
+class PrefetchReader:
+    """
+    Decode frames ahead of the model on background threads.
+
+    Images in a folder are decoded by a small thread pool (cv2 releases the GIL while decoding);
+    video frames are read sequentially on one thread. Frames are yielded in source order as
+    (image_id, frame) pairs through a bounded queue.
+    """
+
+    _END = object()
+
+    def __init__(self, source, prefetch=32, decode_threads=4):
+        self.source = source
+        self.decode_threads = decode_threads
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._thread = threading.Thread(target=self._run, name="prefetch-reader", daemon=True)
+        self._thread.start()
+
+    def _frames(self):
+        if os.path.isdir(self.source):
+            with ThreadPoolExecutor(self.decode_threads) as pool:
+                paths = list(iter_image_files(self.source))
+                # Decode a limited window ahead so memory stays bounded on huge folders
+                window = max(1, self._queue.maxsize)
+                for start in range(0, len(paths), window):
+                    chunk = paths[start:start + window]
+                    yield from zip(chunk, pool.map(cv2.imread, chunk))
+        else:
+            yield from iter_video_frames(self.source)
+
+    def _run(self):
+        try:
+            for image_id, frame in self._frames():
+                if frame is None:
+                    self.failed += 1
+                    print(f"Failed to read {image_id}, skipping")
+                    continue
+                self._queue.put((image_id, frame))
+        except Exception as exc:
+            self._queue.put(exc)
+        self._queue.put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batch_detection(source, weight_path=DEFAULT_WEIGHT_PATH, output_file="batch_detections.jsonl",
+                        batch_size=8, conf=0.8, prefetch=32, decode_threads=4, backend="torch", threads=None,
+                        tiler=None):
+    """
+    Detect objects in every image of `source` and stream one record per image to `output_file`.
+    With a RoiTiler, each image is detected on its ROI tiles (one model call per image) instead.
+    Returns a dict with the number of images processed and the throughput.
+    """
+    model = load_model(weight_path, backend, threads=threads)
+    names = class_names(model.names)
+    reader = PrefetchReader(source, prefetch=prefetch, decode_threads=decode_threads)
+
+    images = 0
+    detections = 0
+    start = time.perf_counter()
+    with DetectionLog(output_file) as log:
+        for batch in iter_batches(reader, batch_size):
+            image_ids, frames = zip(*batch)
+            if tiler is not None:
+                frame_dets = [tiler.detect(model, frame, conf) for frame in frames]
+            else:
+                # One model call per batch instead of one per image
+                frame_dets = [to_numpy([result]) for result in model(list(frames), conf=conf, verbose=False)]
+            for image_id, dets in zip(image_ids, frame_dets):
+                inference_data = to_records(dets, names)
+                log.append(inference_data, image_id=image_id, weight_path=weight_path)
+                detections += len(inference_data)
+            images += len(frames)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "images": images,
+        "failed": reader.failed,
+        "detections": detections,
+        "seconds": elapsed,
+        "images_per_second": images / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run OBB detection over a folder of images or a video file.")
+    parser.add_argument("source", help="Image folder or video file")
+    parser.add_argument("--weights", default=resolve_weight_path(), help="YOLO OBB weight file")
+    parser.add_argument("--output", default="batch_detections.jsonl", help="JSON Lines file to append results to")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime")
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: PyTorch's own for torch, else half the logical CPUs)")
+    parser.add_argument("--batch", type=int, default=8, help="Frames per model call")
+    parser.add_argument("--conf", type=float, default=0.8, help="Confidence threshold")
+    parser.add_argument("--prefetch", type=int, default=32, help="Decoded frames buffered ahead of the model")
+    parser.add_argument("--decode-threads", type=int, default=4, help="Threads decoding folder images")
+    parser.add_argument("--roi", type=parse_roi, help="Only detect inside x,y,w,h (frame pixels)")
+    parser.add_argument("--tile", type=int, help="Split the ROI into overlapping tiles of this size (pixels)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="Fraction of a tile shared with its neighbours")
+    args = parser.parse_args()
+
+    tiler = RoiTiler(args.roi, args.tile, args.tile_overlap) if args.roi or args.tile else None
+
+    stats = run_batch_detection(args.source, args.weights, args.output, batch_size=args.batch, conf=args.conf,
+                                prefetch=args.prefetch, decode_threads=args.decode_threads,
+                                backend=args.backend, threads=args.threads, tiler=tiler)
+    print(f"Processed {stats['images']} image(s) ({stats['failed']} failed), {stats['detections']} detection(s) "
+          f"in {stats['seconds']:.1f}s: {stats['images_per_second']:.2f} images/s")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
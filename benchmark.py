@@ -0,0 +1,313 @@
+"""
+Latency/throughput benchmark of the detection pipeline.
+
+Runs every stage of the GUI pipeline (decode -> model -> OBB extraction -> plot -> preview
+resize/overlay -> pick planning -> log append) on the sample images in `img/` and on synthetic
+frames of several sizes and object counts, for each weight and backend. Reports p50/p95/p99
+latency per stage, images/s and peak RSS, and writes the results as JSON so later runs can be
+compared against them.
+
+Example:
+    python benchmark.py --backends torch onnx --output bench.json
+    python benchmark.py --backends torch onnx --compare bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from batch_detect import iter_image_files
+from detection_log import DetectionLog
+from detections import class_names, to_numpy, to_records
+from frame_source import CaptureThread
+from inference_backends import BACKENDS, load_model, resolve_weight_path
+from pick_planner import picks_to_records, plan_picks
+from preview import draw_obb_overlay
+
+STAGES = ("capture", "decode", "infer", "extract", "plot", "preview", "picks", "log")
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimer:
+    """
+    Collects wall-clock durations (seconds) per stage name.
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        # Milliseconds, stages in pipeline order
+        summary = {}
+        for stage in STAGES:
+            samples = self.samples.get(stage)
+            if not samples:
+                continue
+            times = np.asarray(samples) * 1000.0
+            p50, p95, p99 = np.percentile(times, PERCENTILES)
+            summary[stage] = {"count": len(times), "mean_ms": float(times.mean()), "p50_ms": float(p50),
+                              "p95_ms": float(p95), "p99_ms": float(p99)}
+        return summary
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None when the platform does not report it.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / 1024 ** 2
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_frame(width, height, objects, seed=0):
+    """
+    A textured background with `objects` randomly placed filled rotated rectangles (BGR).
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(90, 110, size=(height, width, 3), dtype=np.uint8)
+    for _ in range(objects):
+        center = (float(rng.uniform(0, width)), float(rng.uniform(0, height)))
+        size = (float(rng.uniform(20, 60)), float(rng.uniform(10, 30)))
+        corners = cv2.boxPoints((center, size, float(rng.uniform(0, 180)))).astype(np.int32)
+        cv2.fillPoly(frame, [corners], tuple(int(c) for c in rng.integers(0, 255, size=3)))
+    return frame
+
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in size.lower().split("x")) for size in text.split(",") if size]
+
+
+def build_inputs(image_dir, sizes, counts):
+    """
+    Benchmark inputs as {name: [(image_id, encoded bytes or file path)]}. Synthetic frames are
+    PNG-encoded up front so the decode stage measures the same work as for files on disk.
+    """
+    inputs = {}
+    if image_dir and os.path.isdir(image_dir):
+        paths = list(iter_image_files(image_dir))
+        if paths:
+            inputs[os.path.basename(os.path.normpath(image_dir))] = [(path, path) for path in paths]
+    for width, height in sizes:
+        for count in counts:
+            ok, encoded = cv2.imencode(".png", synthetic_frame(width, height, count, seed=count))
+            inputs[f"synthetic-{width}x{height}-{count}"] = [(f"synthetic-{width}x{height}-{count}", encoded)]
+    return inputs
+
+
+def decode(source):
+    if isinstance(source, str):
+        return cv2.imread(source)
+    return cv2.imdecode(source, cv2.IMREAD_COLOR)
+
+
+def run_pipeline(model, names, frame, timer, log, conf=0.25, preview_size=(640, 360), preview_buffers=None):
+    """
+    Run the post-capture stages of the GUI pipeline on one BGR frame, timing each stage.
+    """
+    width, height = preview_size
+    small, rgba = preview_buffers
+    with timer.measure("infer"):
+        results = model(frame, conf=conf, verbose=False)
+    with timer.measure("extract"):
+        dets = to_numpy(results)
+    with timer.measure("plot"):
+        results[0].plot()
+    with timer.measure("preview"):
+        cv2.resize(frame, (width, height), dst=small, interpolation=cv2.INTER_LINEAR)
+        draw_obb_overlay(small, dets, width / frame.shape[1], height / frame.shape[0], names)
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGBA, dst=rgba)
+    with timer.measure("picks"):
+        picks = plan_picks(dets)
+    with timer.measure("log"):
+        log.append(to_records(dets, names), image_id="benchmark", picks=picks_to_records(picks, dets, names))
+
+
+def benchmark_model(weight_path, backend, inputs, repeat=5, warmup=2, conf=0.25, threads=None, camera=None,
+                    camera_frames=50):
+    """
+    Benchmark one weight on one backend over every input. Returns one run dict per input.
+    """
+    model = load_model(weight_path, backend, threads=threads)
+    names = class_names(model.names)
+    preview_buffers = (np.zeros((360, 640, 3), dtype=np.uint8), np.zeros((360, 640, 4), dtype=np.uint8))
+    runs = []
+
+    with tempfile.TemporaryDirectory() as scratch, DetectionLog(os.path.join(scratch, "benchmark.jsonl")) as log:
+        for input_name, items in inputs.items():
+            frames = [decode(source) for _, source in items]
+            for frame in frames[:1] * warmup:
+                run_pipeline(model, names, frame, StageTimer(), log, conf, preview_buffers=preview_buffers)
+
+            timer = StageTimer()
+            images = 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for _, source in items:
+                    with timer.measure("decode"):
+                        frame = decode(source)
+                    run_pipeline(model, names, frame, timer, log, conf, preview_buffers=preview_buffers)
+                    images += 1
+            runs.append(make_run(weight_path, backend, input_name, timer, images, time.perf_counter() - start))
+
+        if camera is not None:
+            runs.append(benchmark_camera(model, names, camera, camera_frames, weight_path, backend, log, conf,
+                                         preview_buffers))
+    return runs
+
+
+def benchmark_camera(model, names, index, frames, weight_path, backend, log, conf, preview_buffers):
+    # The capture stage is the wait for the next frame from the capture thread
+    capture = CaptureThread(index)
+    if not capture.start():
+        raise IOError(f"Unable to open camera {index}")
+    timer = StageTimer()
+    try:
+        last = -1
+        start = time.perf_counter()
+        for _ in range(frames):
+            with timer.measure("capture"):
+                frame = capture.wait_for_frame(last, timeout=2.0)
+            if frame is None:
+                break
+            last = frame.index
+            run_pipeline(model, names, frame.image, timer, log, conf, preview_buffers=preview_buffers)
+        elapsed = time.perf_counter() - start
+    finally:
+        capture.stop()
+    return make_run(weight_path, backend, f"camera{index}", timer, len(timer.samples.get("infer", [])), elapsed)
+
+
+def make_run(weight_path, backend, input_name, timer, images, elapsed):
+    return {
+        "weight": weight_path,
+        "backend": backend,
+        "input": input_name,
+        "images": images,
+        "seconds": elapsed,
+        "images_per_second": images / elapsed if elapsed > 0 else 0.0,
+        "stages": timer.summary(),
+        "peak_rss_mb": peak_rss_mb(),  # Peak of the whole process so far
+    }
+
+
+def run_key(run):
+    return os.path.basename(run["weight"]), run["backend"], run["input"]
+
+
+def compare_reports(baseline, current, tolerance=0.10, min_delta_ms=0.05):
+    """
+    Compare two benchmark reports and return a list of regression messages.
+
+    A stage regresses when its p50 or p95 grows by more than `tolerance` (relative) and
+    `min_delta_ms` (absolute, to ignore timer noise on tiny stages); a run regresses when its
+    images/s drops by more than `tolerance`. Runs are matched by weight file name, backend and input.
+    """
+    previous = {run_key(run): run for run in baseline["runs"]}
+    regressions = []
+    for run in current["runs"]:
+        old = previous.get(run_key(run))
+        if old is None:
+            continue
+        label = "/".join(run_key(run))
+        for stage, stats in run["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if old_stats is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                before, after = old_stats[metric], stats[metric]
+                if after - before > min_delta_ms and after > before * (1 + tolerance):
+                    regressions.append(f"{label} {stage} {metric}: {before:.2f} -> {after:.2f} ms")
+        before, after = old["images_per_second"], run["images_per_second"]
+        if after < before * (1 - tolerance):
+            regressions.append(f"{label} images/s: {before:.2f} -> {after:.2f}")
+    return regressions
+
+
+def print_run(run):
+    rss = f"{run['peak_rss_mb']:.0f} MB" if run["peak_rss_mb"] is not None else "n/a"
+    print(f"{os.path.basename(run['weight'])} [{run['backend']}] {run['input']}: "
+          f"{run['images_per_second']:.2f} images/s, peak RSS {rss}")
+    for stage, stats in run["stages"].items():
+        print(f"    {stage:<8} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   p99 {stats['p99_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline stage by stage.")
+    parser.add_argument("--weights", nargs="+", default=[resolve_weight_path()], help="YOLO OBB weight files")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["torch"], help="Inference runtimes")
+    parser.add_argument("--images", default="img", help="Folder of sample images")
+    parser.add_argument("--sizes", default="640x480,1280x720,1920x1080", help="Synthetic frame sizes")
+    parser.add_argument("--objects", default="0,20,100", help="Object counts drawn on synthetic frames")
+    parser.add_argument("--camera", type=int, help="Also benchmark live frames from this camera index")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over each input")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed inferences before each input")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: PyTorch's own for torch, else half the logical CPUs)")
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown for --compare")
+    args = parser.parse_args()
+
+    # Writing the run over its own baseline would make every later comparison pass
+    if args.compare and os.path.abspath(args.compare) == os.path.abspath(args.output):
+        parser.error("--output must differ from --compare, or the baseline is overwritten")
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    inputs = build_inputs(args.images, parse_sizes(args.sizes), [int(c) for c in args.objects.split(",") if c])
+    report = {
+        "created": time.time(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+    for weight_path in args.weights:
+        for backend in args.backends:
+            for run in benchmark_model(weight_path, backend, inputs, repeat=args.repeat, warmup=args.warmup,
+                                       conf=args.conf, threads=args.threads, camera=args.camera):
+                print_run(run)
+                report["runs"].append(run)
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=4)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare_reports(baseline, report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
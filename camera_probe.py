@@ -0,0 +1,183 @@
+import collections
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+# What a probe found out about one camera; `resolutions` is None when the sweep did not finish
+CameraInfo = collections.namedtuple("CameraInfo", ["index", "api", "reads", "resolution", "fps", "resolutions"])
+
+COMMON_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def default_api():
+    # Native capture backend of the platform; CAP_ANY lets OpenCV pick elsewhere
+    if sys.platform.startswith("win"):
+        return cv2.CAP_DSHOW
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+def candidate_indices(max_index=8):
+    """
+    Device indices worth probing. On Linux only existing /dev/video* nodes are tried, elsewhere
+    0..max_index-1.
+    """
+    if sys.platform.startswith("linux"):
+        nodes = glob.glob("/dev/video*")
+        indices = sorted(int(n[len("/dev/video"):]) for n in nodes if n[len("/dev/video"):].isdigit())
+        return [i for i in indices if i < max_index] if nodes else []
+    return list(range(max_index))
+
+
+def probe_camera(index, api=None, resolutions=COMMON_RESOLUTIONS, report=None):
+    """
+    Open camera `index`, read one frame and list which of `resolutions` it accepts.
+    Returns a CameraInfo, or None when the device cannot be opened.
+
+    `report`, if given, is called with the CameraInfo (resolutions None) as soon as the frame was
+    read, before the slower resolution sweep.
+    """
+    api = default_api() if api is None else api
+    cap = cv2.VideoCapture(index, api)
+    try:
+        if not cap.isOpened():
+            return None
+        reads, _ = cap.read()
+        resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if report is not None:
+            report(CameraInfo(index, api, bool(reads), resolution, fps, None))
+
+        supported = []
+        for width, height in resolutions or []:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            # Drivers silently fall back to the nearest mode, so read the size back
+            actual = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            if actual == (width, height):
+                supported.append(actual)
+        return CameraInfo(index, api, bool(reads), resolution, fps, supported)
+    finally:
+        cap.release()
+
+
+def probe_cameras(indices=None, api=None, timeout=3.0, resolutions=COMMON_RESOLUTIONS):
+    """
+    Probe all `indices` concurrently, giving each device at most `timeout` seconds.
+
+    Each probe runs on its own daemon thread, so a driver that hangs on a missing device only
+    costs the timeout once instead of once per index, and never blocks interpreter exit.
+    Returns the CameraInfo of every device that opened, sorted by index. A device that opened but
+    was still sweeping resolutions at the timeout is listed with resolutions None.
+    """
+    indices = candidate_indices() if indices is None else indices
+    found = {}
+
+    def report(info):
+        found[info.index] = info
+
+    def probe(index):
+        try:
+            info = probe_camera(index, api, resolutions, report)
+        except cv2.error as exc:
+            print(f"Camera {index} probe failed: {exc}")
+            return
+        if info is not None:
+            report(info)
+
+    threads = [threading.Thread(target=probe, args=(i,), name=f"camera-probe-{i}", daemon=True) for i in indices]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    timed_out = [i for i, t in zip(indices, threads) if t.is_alive()]
+    if timed_out:
+        print(f"Camera probe timed out for {timed_out}")
+    # Snapshot, since timed-out probes may still report
+    found = dict(found)
+    return [found[i] for i in sorted(found)]
+
+
+class CameraCatalog:
+    """
+    Cached list of available cameras, refreshed in the background.
+
+    The last probe result is stored in `cache_file`, so the camera list is available as soon as the
+    window opens; `refresh()` re-probes on a daemon thread and `poll()` reports (on the caller's
+    thread) when new results are in.
+    """
+
+    def __init__(self, cache_file=None, api=None, timeout=3.0):
+        self.cache_file = cache_file
+        self.api = default_api() if api is None else api
+        self.timeout = timeout
+        self.cameras = self._load_cache()
+
+        self._lock = threading.Lock()
+        self._result = None
+        self._thread = None
+
+    def refresh(self):
+        # Start a background probe unless one is already running
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._refresh, name="camera-catalog", daemon=True)
+        self._thread.start()
+
+    def is_refreshing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self):
+        """
+        Return the new camera list once a refresh finished (and adopt it), otherwise None.
+        """
+        with self._lock:
+            result, self._result = self._result, None
+        if result is not None:
+            self.cameras = result
+        return result
+
+    def _refresh(self):
+        cameras = self.cameras  # Kept if the probe fails
+        try:
+            start = time.perf_counter()
+            cameras = probe_cameras(api=self.api, timeout=self.timeout)
+            print(f"Found {len(cameras)} camera(s) in {time.perf_counter() - start:.2f}s")
+            self._save_cache(cameras)
+        finally:
+            # Always publish, so poll() stops waiting even if the probe failed
+            with self._lock:
+                self._result = cameras
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return []
+        try:
+            with open(self.cache_file, "r") as cache:
+                entries = json.load(cache)
+            return [CameraInfo(e["index"], e["api"], e["reads"], tuple(e["resolution"]), e["fps"],
+                               None if e["resolutions"] is None else [tuple(r) for r in e["resolutions"]])
+                    for e in entries if e["api"] == self.api]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"Ignoring camera cache {self.cache_file}: {exc}")
+            return []
+
+    def _save_cache(self, cameras):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, "w") as cache:
+                json.dump([info._asdict() for info in cameras], cache, indent=4)
+        except OSError as exc:
+            # e.g. a read-only folder; the list still works, it is just not remembered
+            print(f"Unable to write camera cache {self.cache_file}: {exc}")
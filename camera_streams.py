@@ -0,0 +1,64 @@
+import math
+import time
+
+from frame_source import CaptureThread
+from live_tracking import DetectionTracker, RateMeter
+
+
+def tile_layout(count, width, height):
+    """
+    Split a `width` x `height` preview into a near-square grid of `count` tiles and return one
+    (x, y, tile_width, tile_height) per tile, row by row.
+    """
+    if count <= 0:
+        return []
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    tile_width, tile_height = width // columns, height // rows
+    return [((i % columns) * tile_width, (i // columns) * tile_height, tile_width, tile_height) for i in range(count)]
+
+
+class CameraStream:
+    """
+    One open camera: its capture thread plus the per-camera live state (preview tile, tracker,
+    rate meters and detection log).
+
+    Streams only hold state; the app drives them from the Tk thread and submits their frames to
+    the shared InferenceWorker under `key`, so results can be routed back to the right camera.
+    """
+
+    def __init__(self, info, preview=None, log=None, width=1280, height=720, capture=None):
+        self.info = info
+        self.index = info.index
+        self.key = f"cam{info.index}"
+        # Any object with the CaptureThread interface can stand in for the camera (e.g. a ReplaySource)
+        self.capture = capture if capture is not None else CaptureThread(info.index, info.api, width, height)
+        self.preview = preview  # PreviewRenderer of this camera's tile
+        self.log = log  # DetectionLog the camera's results are appended to
+        self.recorder = None  # FrameRecorder of the frames sent to detection, while recording
+        self.tracker = DetectionTracker()
+        self.reset()
+
+    def reset(self):
+        # Called when live mode starts
+        self.last_frame = -1  # Index of the last frame handled by the live loop
+        self.next_inference_due = 0.0
+        self.latest_job_id = None
+        self.dropped = 0  # Frames due for detection but skipped because the camera's slot was busy
+        self.capture_meter = RateMeter()
+        self.inference_meter = RateMeter()
+        self.tracker.reset()
+
+    def start(self, timeout=5.0):
+        return self.capture.start(timeout)
+
+    def image_id(self, frame):
+        # Camera and capture time (to the millisecond) of a grabbed frame
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(frame.timestamp))
+        return f"cam{self.index}_{stamp}-{int(frame.timestamp * 1000) % 1000:03d}"
+
+    def close(self):
+        self.capture.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
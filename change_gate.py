@@ -0,0 +1,129 @@
+import collections
+import threading
+
+import cv2
+import numpy as np
+
+from detections import DETECTION_DTYPE
+from obb_geometry import as_boxes, rotated_nms
+
+# What to do with a frame: "reuse" the cached detections, re-infer only `region`
+# (x0, y0, x1, y1 in frame pixels) or run the "full" frame
+GateDecision = collections.namedtuple("GateDecision", ["action", "region", "dets", "fraction"])
+
+
+class ChangeGate:
+    """
+    Skips inference for frames that did not change since the last inferred frame of the same key.
+
+    Frames are compared as small blurred grayscale thumbnails, at least `width` pixels wide and
+    large enough that the short side of the smallest part (`min_part_size`, (w, h) in frame pixels)
+    spans `min_part_pixels` thumbnail pixels, so one part is visible at any camera resolution.
+    When fewer thumbnail pixels than `min_part_change` of the smallest part's footprint differ by
+    more than `pixel_threshold` grey levels, the cached detections are reused; removing or moving a
+    single part is always seen as a change. Otherwise the changed pixels' bounding box, grown by
+    `margin` frame pixels so whole parts are included, is re-inferred on its own and merged into
+    the cached detections, unless it covers more than `full_ratio` of the frame, in which case the
+    full frame is run. Each key (camera) has its own reference; `invalidate()` drops all of them
+    and must be called when the weight changes.
+    """
+
+    def __init__(self, width=160, pixel_threshold=15, min_part_size=(53, 21), min_part_pixels=4,
+                 min_part_change=0.25, full_ratio=0.25, margin=48, iou_threshold=0.5):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_part_size = min_part_size
+        self.min_part_pixels = min_part_pixels
+        self.min_part_change = min_part_change
+        self.full_ratio = full_ratio
+        self.margin = margin
+        self.iou_threshold = iou_threshold
+        self._state = {}  # key -> (frame shape, reference thumbnail, DETECTION_DTYPE array)
+        self._lock = threading.Lock()
+
+    def scale(self, frame_shape):
+        # Thumbnail pixels per frame pixel
+        return min(1.0, max(self.width / frame_shape[1], self.min_part_pixels / min(self.min_part_size)))
+
+    def min_changed_pixels(self, frame_shape):
+        # Changed thumbnail pixels below which a frame counts as unchanged
+        part_w, part_h = self.min_part_size
+        return self.min_part_change * part_w * part_h * self.scale(frame_shape) ** 2
+
+    def thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.scale(frame.shape)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        # Blur so sensor noise and compression artefacts do not count as change
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def check(self, frame, key="main"):
+        """
+        Decide how to handle `frame`. The thumbnail is returned as well, to be passed to update()/merge().
+        """
+        small = self.thumbnail(frame)
+        with self._lock:
+            state = self._state.get(key)
+        if state is None or state[0] != frame.shape:
+            return GateDecision("full", None, None, 1.0), small
+
+        _, reference, dets = state
+        changed = cv2.absdiff(small, reference) > self.pixel_threshold
+        count = int(np.count_nonzero(changed))
+        fraction = count / changed.size
+        if count < self.min_changed_pixels(frame.shape):
+            return GateDecision("reuse", None, dets, fraction), small
+
+        ys, xs = np.nonzero(changed)
+        scale_x, scale_y = frame.shape[1] / small.shape[1], frame.shape[0] / small.shape[0]
+        x0 = max(0, int(xs.min() * scale_x) - self.margin)
+        y0 = max(0, int(ys.min() * scale_y) - self.margin)
+        x1 = min(frame.shape[1], int((xs.max() + 1) * scale_x) + self.margin)
+        y1 = min(frame.shape[0], int((ys.max() + 1) * scale_y) + self.margin)
+        if (x1 - x0) * (y1 - y0) > self.full_ratio * frame.shape[0] * frame.shape[1]:
+            return GateDecision("full", None, None, fraction), small
+        return GateDecision("region", (x0, y0, x1, y1), dets, fraction), small
+
+    def update(self, key, frame_shape, small, dets):
+        # A full frame was inferred: it becomes the new reference
+        with self._lock:
+            self._state[key] = (frame_shape, small, dets)
+
+    def merge(self, key, frame_shape, small, region, region_dets):
+        """
+        Replace the cached detections inside `region` by `region_dets` (frame coordinates) and
+        return the merged array. Only the region of the reference thumbnail is refreshed, so slow
+        drift elsewhere still adds up to a detectable change.
+        """
+        with self._lock:
+            state = self._state.get(key)
+        if state is None or state[0] != frame_shape:
+            # Invalidated meanwhile; the next frame of this key runs in full
+            return region_dets
+
+        _, reference, cached = state
+        x0, y0, x1, y1 = region
+        inside = (cached["x"] >= x0) & (cached["x"] < x1) & (cached["y"] >= y0) & (cached["y"] < y1)
+        merged = np.concatenate([cached[~inside], np.asarray(region_dets, dtype=DETECTION_DTYPE)])
+        if len(merged) > 1:
+            # Parts on the region border can be seen both in the cache and in the new crop
+            merged = merged[rotated_nms(as_boxes(merged), merged["confidence"], self.iou_threshold, merged["class_id"])]
+
+        scale_x, scale_y = small.shape[1] / frame_shape[1], small.shape[0] / frame_shape[0]
+        sx0, sy0 = int(x0 * scale_x), int(y0 * scale_y)
+        sx1, sy1 = int(np.ceil(x1 * scale_x)), int(np.ceil(y1 * scale_y))
+        reference = reference.copy()
+        reference[sy0:sy1, sx0:sx1] = small[sy0:sy1, sx0:sx1]
+        with self._lock:
+            self._state[key] = (frame_shape, reference, merged)
+        return merged
+
+    def invalidate(self, key=None):
+        # Forget one key's reference, or all of them (weight switch)
+        with self._lock:
+            if key is None:
+                self._state.clear()
+            else:
+                self._state.pop(key, None)
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+
+
+class DetectionLog:
+    """
+    Append-only detection log stored as JSON Lines (one JSON object per frame).
+
+    Every record is flushed to the OS as soon as it is appended, so readers of the
+    file see the newest frame at once; only the fsync is batched, every `flush_every`
+    records or `fsync_interval` seconds. Saving a frame costs the same no matter how
+    long the log already is. When the file grows past
+    `max_bytes` it is rotated to `<path>.1`, `<path>.2`, ... like logging's
+    RotatingFileHandler.
+    """
+
+    def __init__(self, path="hasil.jsonl", flush_every=32, fsync_interval=5.0,
+                 max_bytes=64 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.last_offset = None  # Byte offset of the last appended record in the current file
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, detections, image_id=None, weight_path=None, timestamp=None, **extra):
+        """
+        Append one frame record and return it.
+
+        Args:
+            detections: List of detection dicts (x, y, w, h, r, confidence, class).
+            image_id: Identifier of the frame (file path, capture counter, ...).
+            weight_path: Weight file that produced the detections.
+            timestamp: Unix time of the frame, defaults to now.
+            extra: Additional fields stored alongside the record.
+        """
+        record = {
+            "image_id": image_id,
+            "timestamp": time.time() if timestamp is None else timestamp,
+            "weight_path": weight_path,
+            "detections": detections,
+        }
+        record.update(extra)
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                raise ValueError("DetectionLog is closed")
+            if self.max_bytes and self._file.tell() + len(line) > self.max_bytes and self._file.tell() > 0:
+                self._rotate()
+            self.last_offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()  # Visible to readers right away; durability is batched below
+            self._pending += 1
+            if self._pending >= self.flush_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+        return record
+
+    def flush(self):
+        # Force buffered records to disk
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        # Shift path.N-1 -> path.N, ..., path -> path.1 and start a fresh file
+        self._sync()
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_detections(path):
+    """
+    Yield frame records from a detection log.
+
+    Understands both the JSON Lines stream written by DetectionLog and the old
+    `hasil.json` format (a single JSON list of detections). The old format has no
+    frame boundaries, so its whole content is yielded as one record.
+    """
+    with open(path, "r", encoding="utf-8") as log_file:
+        # Peek at the first non-whitespace character to tell the formats apart
+        head = log_file.read(64).lstrip()
+        log_file.seek(0)
+
+        if head.startswith("["):
+            legacy = json.load(log_file)
+            yield {
+                "image_id": None,
+                "timestamp": os.path.getmtime(path),
+                "weight_path": None,
+                "detections": [d for d in legacy if "image_path" not in d],
+                "legacy": True,
+            }
+            return
+
+        for line in log_file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def convert_legacy(src="hasil.json", dst="hasil.jsonl"):
+    """
+    Convert an old `hasil.json` list into records appended to a JSON Lines log.
+    Returns the number of records written.
+    """
+    count = 0
+    with DetectionLog(dst) as log:
+        for record in read_detections(src):
+            log.append(record.pop("detections"), **record)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert an old hasil.json file into the JSON Lines detection log.")
+    parser.add_argument("src", nargs="?", default="hasil.json")
+    parser.add_argument("dst", nargs="?", default="hasil.jsonl")
+    args = parser.parse_args()
+
+    written = convert_legacy(args.src, args.dst)
+    print(f"Converted {written} record(s) from {args.src} to {args.dst}")
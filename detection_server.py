@@ -0,0 +1,454 @@
+"""
+Headless detection server for the robot controller.
+
+Clients connect over TCP and send length-prefixed requests; each request either carries an
+encoded image (PNG/JPG bytes) to detect on, or triggers a capture from one of the server's
+cameras. Responses carry the OBB detections and ranked picks either as compact JSON or as raw
+DETECTION_DTYPE / PICK_DTYPE rows.
+
+Every message starts with a 13-byte big-endian header:
+
+    request:  magic b"BP", version, op,     request id (u32), format, payload length (u32)
+    response: magic b"BP", version, status, request id (u32), format, payload length (u32)
+
+Clients may pipeline any number of requests on one connection and match responses by request
+id. Requests from all clients go through one bounded queue; when it is full the server answers
+STATUS_BUSY right away instead of letting latency grow. Queued frames are run through the model
+in batches on a single inference thread.
+
+Example:
+    python detection_server.py serve --weights weights/bestV3-OBB.pt --camera 0 --port 5555
+    python detection_server.py client --image img/77_Color.png --count 20 --binary
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detection_log import DetectionLog
+from detections import DETECTION_DTYPE, class_names, to_bytes, to_numpy, to_records
+from frame_source import CaptureThread
+from pick_planner import PICK_DTYPE, picks_to_records, plan_picks
+
+MAGIC = b"BP"
+VERSION = 1
+HEADER = struct.Struct(">2sBBIBI")
+# Binary response payload: frame timestamp, detection count, pick count, then the raw rows
+BINARY_HEADER = struct.Struct(">dII")
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+OP_PING = 0
+OP_DETECT = 1  # Payload: encoded image
+OP_CAPTURE = 2  # Payload: camera index (u16), or empty for the first camera
+
+FORMAT_JSON = 0
+FORMAT_BINARY = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_BUSY = 2
+
+
+class DetectionError(Exception):
+    """
+    The server answered a request with an error.
+    """
+
+
+class ServerBusy(DetectionError):
+    """
+    The server's request queue was full; retry later.
+    """
+
+
+def encode_result(fmt, dets, picks, names, image_id=None, timestamp=None, weight_path=None, elapsed=None):
+    if fmt == FORMAT_BINARY:
+        return (BINARY_HEADER.pack(timestamp or 0.0, len(dets), len(picks)) + to_bytes(dets)
+                + np.ascontiguousarray(picks, dtype=PICK_DTYPE).tobytes())
+    record = {
+        "image_id": image_id,
+        "timestamp": timestamp,
+        "weight_path": weight_path,
+        "elapsed": elapsed,
+        "detections": to_records(dets, names),
+        "picks": picks_to_records(picks, dets, names),
+    }
+    return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+
+def decode_result(fmt, payload):
+    """
+    Decode a response payload: a dict for JSON, or a dict with "timestamp", "detections"
+    (DETECTION_DTYPE array) and "picks" (PICK_DTYPE array) for binary.
+    """
+    if fmt != FORMAT_BINARY:
+        return json.loads(payload.decode("utf-8")) if payload else {}
+    timestamp, det_count, pick_count = BINARY_HEADER.unpack_from(payload)
+    offset = BINARY_HEADER.size
+    dets = np.frombuffer(payload, dtype=DETECTION_DTYPE, count=det_count, offset=offset)
+    offset += det_count * DETECTION_DTYPE.itemsize
+    picks = np.frombuffer(payload, dtype=PICK_DTYPE, count=pick_count, offset=offset)
+    return {"timestamp": timestamp, "detections": dets, "picks": picks}
+
+
+async def write_message(writer, lock, code, request_id, fmt, payload=b""):
+    # One writer per connection is shared by pipelined responses, so whole messages go out under a lock
+    async with lock:
+        if writer.is_closing():
+            return
+        writer.write(HEADER.pack(MAGIC, VERSION, code, request_id, fmt, len(payload)) + payload)
+        await writer.drain()
+
+
+async def read_message(reader):
+    """
+    Read one message and return (code, request id, format, payload).
+    """
+    magic, version, code, request_id, fmt, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Bad message header {magic!r} v{version}")
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {length} bytes exceeds the {MAX_PAYLOAD} byte limit")
+    payload = await reader.readexactly(length) if length else b""
+    return code, request_id, fmt, payload
+
+
+class DetectionServer:
+    """
+    asyncio TCP server around one loaded model.
+
+    `cameras` maps camera indices to started CaptureThreads (see `open_cameras`); capture
+    requests wait for the first frame taken after the request arrived. Up to `max_queue`
+    requests wait for the model; up to `max_batch` of them are run as one model call.
+    """
+
+    def __init__(self, model, weight_path=None, cameras=None, conf=0.8, max_queue=32, max_batch=4, log=None,
+                 host="127.0.0.1", port=5555):
+        self.model = model
+        self.weight_path = weight_path
+        self.names = class_names(model.names)
+        self.cameras = cameras or {}
+        self.conf = conf
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.log = log
+        self.host = host
+        self.port = port
+        self.served = 0
+        self.rejected = 0
+
+        self._queue = None
+        self._server = None
+        self._worker = None
+        self._clients = {}  # Connection handler task -> writer
+        # The model is only ever called from this thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="server-inference")
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # Resolves port 0
+        self._worker = asyncio.create_task(self._run_inference())
+        print(f"Detection server listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Let the connection handlers finish instead of being cancelled mid-read
+            for writer in self._clients.values():
+                writer.close()
+            if self._clients:
+                await asyncio.wait(list(self._clients), timeout=1.0)
+            await self._server.wait_closed()
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        lock = asyncio.Lock()
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            while True:
+                op, request_id, fmt, payload = await read_message(reader)
+                if op == OP_PING:
+                    await write_message(writer, lock, STATUS_OK, request_id, FORMAT_JSON)
+                    continue
+                if op not in (OP_DETECT, OP_CAPTURE):
+                    await self._send_error(writer, lock, request_id, f"Unknown op {op}")
+                    continue
+                try:
+                    self._queue.put_nowait((op, request_id, fmt, payload, writer, lock, time.time()))
+                except asyncio.QueueFull:
+                    self.rejected += 1
+                    await write_message(writer, lock, STATUS_BUSY, request_id, FORMAT_JSON)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # Client went away
+        except ValueError as exc:
+            print(f"Dropping client {peer}: {exc}")
+        finally:
+            self._clients.pop(task, None)
+            writer.close()
+
+    async def _send_error(self, writer, lock, request_id, message):
+        payload = json.dumps({"error": message}).encode("utf-8")
+        await write_message(writer, lock, STATUS_ERROR, request_id, FORMAT_JSON, payload)
+
+    async def _run_inference(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.max_batch and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+
+            # Decoding and waiting for camera frames run in the default pool, in parallel
+            frames = await asyncio.gather(*(loop.run_in_executor(None, self._prepare, job) for job in jobs),
+                                          return_exceptions=True)
+            ready = []
+            for job, frame in zip(jobs, frames):
+                if isinstance(frame, Exception):
+                    await self._reply_error(job, str(frame))
+                else:
+                    ready.append((job, frame))
+            if not ready:
+                continue
+
+            start = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(self._executor, self._detect, [frame for _, (_, frame, _) in ready])
+            except Exception as exc:
+                for job, _ in ready:
+                    await self._reply_error(job, f"Inference failed: {exc}")
+                continue
+            elapsed = time.perf_counter() - start
+
+            for ((_, request_id, fmt, _, writer, lock, _), (image_id, _, timestamp)), (dets, picks) in zip(ready, outputs):
+                # One client resetting mid-send or a failing log write must not end the loop for everyone
+                try:
+                    payload = encode_result(fmt, dets, picks, self.names, image_id=image_id, timestamp=timestamp,
+                                            weight_path=self.weight_path, elapsed=elapsed)
+                    await write_message(writer, lock, STATUS_OK, request_id, fmt, payload)
+                    if self.log is not None:
+                        self.log.append(to_records(dets, self.names), image_id=image_id,
+                                        weight_path=self.weight_path, timestamp=timestamp,
+                                        picks=picks_to_records(picks, dets, self.names))
+                except Exception as exc:
+                    print(f"Error: Could not answer request {request_id}: {exc!r}")
+                    continue
+                self.served += 1
+
+    async def _reply_error(self, job, message):
+        try:
+            await self._send_error(job[4], job[5], job[1], message)
+        except Exception as exc:
+            print(f"Error: Could not answer request {job[1]}: {exc!r}")
+
+    def _prepare(self, job):
+        """
+        Return (image id, BGR frame, frame time) for a queued request. Runs on a pool thread.
+        """
+        op, request_id, _, payload, _, _, arrived = job
+        if op == OP_DETECT:
+            frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode the image")
+            return f"request-{request_id}", frame, arrived
+
+        index = struct.unpack(">H", payload)[0] if payload else next(iter(self.cameras), None)
+        capture = self.cameras.get(index)
+        if capture is None:
+            raise ValueError(f"Camera {index} is not open on the server")
+        # The first frame taken after the trigger, not one that sat in the buffer
+        latest = capture.latest()
+        frame = latest if latest is not None and latest.timestamp >= arrived else capture.wait_for_frame(
+            latest.index if latest is not None else -1, timeout=2.0)
+        if frame is None:
+            raise ValueError(f"Camera {index} delivered no frame")
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(frame.timestamp))
+        return f"cam{index}_{stamp}-{int(frame.timestamp * 1000) % 1000:03d}", frame.image, frame.timestamp
+
+    def _detect(self, frames):
+        # One model call for the whole batch; runs on the inference thread
+        results = self.model(frames if len(frames) > 1 else frames[0], conf=self.conf, verbose=False)
+        outputs = []
+        for result in results:
+            dets = to_numpy([result])
+            outputs.append((dets, plan_picks(dets)))
+        return outputs
+
+
+def open_cameras(indices):
+    cameras = {}
+    for index in indices:
+        capture = CaptureThread(index)
+        if capture.start():
+            cameras[index] = capture
+        else:
+            print(f"Error: Unable to open camera {index}")
+    return cameras
+
+
+class DetectionClient:
+    """
+    Pipelining client. Every request method returns once its own response arrived, so several
+    requests can be in flight at once with asyncio.gather.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5555):
+        self.host = host
+        self.port = port
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        self._receiver = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._receiver = asyncio.create_task(self._receive())
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._receiver is not None:
+            self._receiver.cancel()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, op, payload=b"", fmt=FORMAT_JSON):
+        if self._receiver is None or self._receiver.done():
+            raise ConnectionError("Not connected to the detection server")
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await write_message(self._writer, self._lock, op, request_id, fmt, payload)
+        status, fmt, payload = await future
+        if status == STATUS_BUSY:
+            raise ServerBusy("Server queue is full")
+        if status != STATUS_OK:
+            raise DetectionError(json.loads(payload.decode("utf-8")).get("error", "Unknown error"))
+        return decode_result(fmt, payload)
+
+    async def ping(self):
+        await self.request(OP_PING)
+
+    async def detect(self, image, binary=False, codec=".png"):
+        # `image` is a BGR array (encoded with `codec`) or already encoded bytes
+        if isinstance(image, np.ndarray):
+            ok, encoded = cv2.imencode(codec, image)
+            if not ok:
+                raise ValueError(f"Could not encode the image as {codec}")
+            image = encoded.tobytes()
+        return await self.request(OP_DETECT, image, FORMAT_BINARY if binary else FORMAT_JSON)
+
+    async def capture(self, camera=None, binary=False):
+        payload = struct.pack(">H", camera) if camera is not None else b""
+        return await self.request(OP_CAPTURE, payload, FORMAT_BINARY if binary else FORMAT_JSON)
+
+    async def _receive(self):
+        try:
+            while True:
+                status, request_id, fmt, payload = await read_message(self._reader)
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, fmt, payload))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as exc:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Connection to server lost: {exc}"))
+            self._pending.clear()
+
+
+async def run_client(args):
+    async with DetectionClient(args.host, args.port) as client:
+        if args.capture is not None:
+            requests = [client.capture(args.capture, args.binary) for _ in range(args.count)]
+        else:
+            images = [open(path, "rb").read() for path in args.image]
+            requests = [client.detect(images[i % len(images)], args.binary) for i in range(args.count)]
+        start = time.perf_counter()
+        # All requests are in flight at once; the server queue decides how many are accepted
+        responses = await asyncio.gather(*requests, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    answered = [r for r in responses if not isinstance(r, Exception)]
+    busy = sum(isinstance(r, ServerBusy) for r in responses)
+    for response in responses:
+        if isinstance(response, Exception) and not isinstance(response, ServerBusy):
+            print(f"Request failed: {response}")
+    if answered:
+        first = answered[0]
+        print(f"First response: {len(first['detections'])} detection(s), {len(first['picks'])} pick(s)")
+    print(f"{len(answered)}/{len(responses)} answered ({busy} busy) in {elapsed:.2f}s: "
+          f"{len(answered) / elapsed if elapsed > 0 else 0.0:.2f} requests/s")
+
+
+async def run_server(args):
+    from inference_backends import load_model
+
+    model = load_model(args.weights, args.backend, threads=args.threads)
+    log = DetectionLog(args.log) if args.log else None
+    server = DetectionServer(model, args.weights, cameras=open_cameras(args.camera), conf=args.conf,
+                             max_queue=args.max_queue, max_batch=args.batch, log=log, host=args.host, port=args.port)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        for capture in server.cameras.values():
+            capture.stop()
+        if log is not None:
+            log.close()
+
+
+def main():
+    from inference_backends import BACKENDS, resolve_weight_path
+
+    parser = argparse.ArgumentParser(description="Serve OBB detections and picks over TCP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on / connect to")
+    parser.add_argument("--port", type=int, default=5555)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the detection server")
+    serve.add_argument("--weights", default=resolve_weight_path(), help="YOLO OBB weight file")
+    serve.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime")
+    serve.add_argument("--threads", type=int, help="Intra-op threads (default: PyTorch's own for torch, else half the logical CPUs)")
+    serve.add_argument("--camera", type=int, nargs="*", default=[], help="Camera indices to open for capture requests")
+    serve.add_argument("--conf", type=float, default=0.8, help="Confidence threshold")
+    serve.add_argument("--max-queue", type=int, default=32, help="Requests waiting for the model before BUSY")
+    serve.add_argument("--batch", type=int, default=4, help="Queued frames per model call")
+    serve.add_argument("--log", help="Also append every result to this JSON Lines log")
+
+    client = commands.add_parser("client", help="Send pipelined requests to a running server")
+    client.add_argument("--image", nargs="*", default=[os.path.join("img", "77_Color.png")], help="Images to send")
+    client.add_argument("--capture", type=int, help="Trigger captures on this camera instead of sending images")
+    client.add_argument("--count", type=int, default=1, help="Requests to send at once")
+    client.add_argument("--binary", action="store_true", help="Ask for binary instead of JSON responses")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args) if args.command == "serve" else run_client(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
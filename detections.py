@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+
+# One row per oriented box; class_id indexes the model's class name table
+DETECTION_DTYPE = np.dtype([
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("w", "<f4"),
+    ("h", "<f4"),
+    ("r", "<f4"),
+    ("confidence", "<f4"),
+    ("class_id", "<i4"),
+])
+
+
+def class_names(names):
+    """
+    Build an indexable class name table from `model.names` (a {index: name} dict or a list).
+    Compute it once per weight load and pass it to the functions below.
+    """
+    if isinstance(names, np.ndarray):
+        return names
+    if isinstance(names, dict):
+        table = [str(i) for i in range(max(names) + 1)] if names else []
+        for index, name in names.items():
+            table[index] = name
+        names = table
+    return np.array(names, dtype=object)
+
+
+def to_numpy(results):
+    """
+    Convert YOLO OBB results into one structured array of DETECTION_DTYPE.
+
+    Each result's box tensor is copied to the host in a single transfer instead of indexing the
+    tensors element by element.
+    """
+    arrays = []
+    for result in results:
+        if result.obb is None or len(result.obb) == 0:
+            continue
+        # obb.data rows are (x, y, w, h, r, [track_id,] conf, cls)
+        data = result.obb.data.cpu().numpy()
+        dets = np.empty(len(data), dtype=DETECTION_DTYPE)
+        dets["x"] = data[:, 0]
+        dets["y"] = data[:, 1]
+        dets["w"] = data[:, 2]
+        dets["h"] = data[:, 3]
+        dets["r"] = data[:, 4]
+        dets["confidence"] = data[:, -2]
+        dets["class_id"] = data[:, -1]
+        arrays.append(dets)
+
+    if not arrays:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+    return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+
+def to_records(dets, names):
+    """
+    Convert a DETECTION_DTYPE array into the list of dicts written to the detection log.
+    """
+    if len(dets) == 0:
+        return []
+    names = class_names(names)
+    columns = (dets["x"].tolist(), dets["y"].tolist(), dets["w"].tolist(), dets["h"].tolist(),
+               dets["r"].tolist(), dets["confidence"].tolist(), names[dets["class_id"]].tolist())
+    return [
+        {"x": x, "y": y, "w": w, "h": h, "r": r, "confidence": conf, "class": name}
+        for x, y, w, h, r, conf, name in zip(*columns)
+    ]
+
+
+def to_json(dets, names, indent=None):
+    if indent is None:
+        return json.dumps(to_records(dets, names), separators=(",", ":"))
+    return json.dumps(to_records(dets, names), indent=indent)
+
+
+def to_bytes(dets):
+    # Compact binary form: the raw little-endian DETECTION_DTYPE rows (28 bytes per box)
+    return np.ascontiguousarray(dets, dtype=DETECTION_DTYPE).tobytes()
+
+
+def from_bytes(buffer):
+    return np.frombuffer(buffer, dtype=DETECTION_DTYPE)
+
+
+def extract_detections(results, names):
+    """
+    Convert YOLO OBB results into a list of detection dicts in xywhr format.
+
+    Args:
+        results: Iterable of ultralytics Results (one per image).
+        names: Class name table from `class_names()` (or `model.names`).
+    Returns:
+        List of {"x", "y", "w", "h", "r", "confidence", "class"} dicts; empty when no OBB data was found.
+    """
+    return to_records(to_numpy(results), names)
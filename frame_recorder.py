@@ -0,0 +1,269 @@
+"""
+Frame recordings for reproducing picks offline.
+
+A recording is three files next to each other:
+
+    <name>.frames       preallocated ring of fixed-size slots holding raw BGR frames
+    <name>.frames.idx   one INDEX_DTYPE row per slot: frame number, timestamp, shape, image id and
+                        the byte offset of the frame's record in the detection log (-1 if none)
+    <name>.frames.json  slot count/size and the camera the frames came from
+
+Both binary files are numpy memmaps, so recording is a memcpy into the page cache and replaying
+hands out views into the file without copying. Once the ring is full the oldest frames are
+overwritten.
+
+Example:
+    python frame_recorder.py recordings/cam0_20241001-101500.frames
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from camera_probe import CameraInfo
+from frame_source import Frame
+
+INDEX_DTYPE = np.dtype([
+    ("frame", "<i8"),        # Running frame number, -1 for an empty slot
+    ("timestamp", "<f8"),
+    ("height", "<i4"),
+    ("width", "<i4"),
+    ("channels", "<i4"),
+    ("log_offset", "<i8"),   # Byte offset of the detection record in the log, -1 if none
+    ("image_id", "S64"),
+])
+VERSION = 1
+# CameraInfo.api of a replayed recording, so it can be told apart from real devices
+REPLAY_API = -1
+
+
+class FrameRecorder:
+    """
+    Records frames into a preallocated memory-mapped ring of `slots` frames of at most
+    `frame_shape`. Not thread-safe; record from one thread.
+    """
+
+    def __init__(self, path, slots=200, frame_shape=(720, 1280, 3), camera=None):
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = int(np.prod(frame_shape))
+        self.count = 0  # Frames recorded so far
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._data = np.memmap(path, dtype=np.uint8, mode="w+", shape=(slots, self.slot_bytes))
+        self._index = np.memmap(path + ".idx", dtype=INDEX_DTYPE, mode="w+", shape=(slots,))
+        self._index["frame"] = -1
+        self._index["log_offset"] = -1
+        with open(path + ".json", "w") as meta_file:
+            json.dump({"version": VERSION, "slots": slots, "slot_bytes": self.slot_bytes,
+                       "frame_shape": list(frame_shape), "camera": camera}, meta_file, indent=4)
+
+    def record(self, image, timestamp=None, image_id=None):
+        """
+        Copy `image` into the next slot and return its frame number (None if it does not fit).
+        """
+        if image.nbytes > self.slot_bytes:
+            print(f"Frame of shape {image.shape} does not fit the {self.path} slots, not recorded")
+            return None
+        number = self.count
+        slot = number % self.slots
+        height, width = image.shape[:2]
+
+        # Invalidate the slot first so a reader never pairs old metadata with new pixels
+        self._index["frame"][slot] = -1
+        self._data[slot, :image.nbytes] = np.ascontiguousarray(image).reshape(-1)
+        self._index["timestamp"][slot] = time.time() if timestamp is None else timestamp
+        self._index["height"][slot] = height
+        self._index["width"][slot] = width
+        self._index["channels"][slot] = image.shape[2] if image.ndim == 3 else 1
+        self._index["log_offset"][slot] = -1
+        self._index["image_id"][slot] = (image_id or "").encode("utf-8")[:64]
+        self._index["frame"][slot] = number
+        self.count += 1
+        return number
+
+    def set_log_offset(self, number, offset):
+        # Link a recorded frame to its detection log record, if the slot was not reused since
+        if self._index is None or offset is None:
+            return  # Closed meanwhile, or the record was not written
+        slot = number % self.slots
+        if self._index["frame"][slot] == number:
+            self._index["log_offset"][slot] = offset
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        if self._data is not None:
+            self.flush()
+            self._data = self._index = None
+
+
+class Recording:
+    """
+    Read-only view of a recording. Frames are returned as views into the memory map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".json", "r") as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta.get("version") != VERSION:
+            raise ValueError(f"Unsupported recording version {self.meta.get('version')} in {path}")
+        self._data = np.memmap(path, dtype=np.uint8, mode="r", shape=(self.meta["slots"], self.meta["slot_bytes"]))
+        self.index = np.memmap(path + ".idx", dtype=INDEX_DTYPE, mode="r", shape=(self.meta["slots"],))
+        # Slots in recording order; the oldest frames may have been overwritten
+        valid = np.nonzero(self.index["frame"] >= 0)[0]
+        self.order = valid[np.argsort(self.index["frame"][valid])]
+
+    def __len__(self):
+        return len(self.order)
+
+    def entry(self, position):
+        return self.index[self.order[position]]
+
+    def image(self, position):
+        slot = self.order[position]
+        height, width, channels = (int(self.index[field][slot]) for field in ("height", "width", "channels"))
+        image = self._data[slot, :height * width * channels]
+        return image.reshape((height, width, channels) if channels > 1 else (height, width))
+
+    def camera_info(self):
+        # A CameraInfo for the recording, so it can be opened like a camera
+        height, width = self.meta["frame_shape"][:2]
+        timestamps = self.index["timestamp"][self.order]
+        span = timestamps[-1] - timestamps[0] if len(timestamps) > 1 else 0.0
+        fps = float((len(timestamps) - 1) / span) if span > 0 else 0.0
+        camera = self.meta.get("camera")
+        return CameraInfo(camera if camera is not None else 0, REPLAY_API, len(self) > 0, (width, height), fps, [])
+
+
+class ReplaySource:
+    """
+    Plays a recording back through the CaptureThread interface, so CameraApp can open it like a camera.
+
+    Frames are published at the recorded pace divided by `speed` (None for as fast as possible)
+    with their recorded timestamps, so image ids and tracking behave as they did live. When looping,
+    each pass is shifted by the recording's length so time keeps increasing. The images are
+    read-only views into the memory-mapped recording.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, buffer_size=4):
+        self.recording = Recording(path)
+        self.index = self.recording.camera_info().index
+        self.speed = speed
+        self.loop = loop
+
+        self._frames = collections.deque(maxlen=buffer_size)
+        self._frame_ready = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self, timeout=5.0):
+        if len(self.recording) == 0:
+            print(f"Recording {self.recording.path} is empty")
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="replay", daemon=True)
+        self._thread.start()
+        return True
+
+    def wait_opened(self, timeout=5.0):
+        return self.is_opened()
+
+    def is_opened(self):
+        return self._running
+
+    def stop(self):
+        self._running = False
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def set_resolution(self, width, height):
+        pass  # Frames are replayed at the recorded size
+
+    @property
+    def resolution(self):
+        height, width = self.recording.meta["frame_shape"][:2]
+        return width, height
+
+    def latest(self):
+        with self._frame_ready:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, after_index=-1, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            while not self._frames or self._frames[-1].index <= after_index:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._frame_ready.wait(remaining)
+            return self._frames[-1]
+
+    def frames(self):
+        with self._frame_ready:
+            return list(self._frames)
+
+    def _run(self):
+        recording = self.recording
+        timestamps = recording.index["timestamp"][recording.order]
+        # One pass lasts the recorded span plus one average frame interval
+        span = float(timestamps[-1] - timestamps[0])
+        period = span + (span / (len(timestamps) - 1) if len(timestamps) > 1 and span > 0 else 1.0)
+        count = 0
+        offset = 0.0
+        while self._running:
+            start, first = time.monotonic(), timestamps[0]
+            for position in range(len(recording)):
+                if not self._running:
+                    return
+                if self.speed:
+                    delay = start + (timestamps[position] - first) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                frame = Frame(count, float(timestamps[position]) + offset, recording.image(position))
+                count += 1
+                with self._frame_ready:
+                    self._frames.append(frame)
+                    self._frame_ready.notify_all()
+            if not self.loop:
+                break
+            offset += period
+        self._running = False
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the frames of a recording.")
+    parser.add_argument("recording", help="Path of the .frames file")
+    parser.add_argument("--export", help="Write the frames as PNG files into this folder")
+    args = parser.parse_args()
+
+    recording = Recording(args.recording)
+    print(f"{len(recording)} frame(s), camera {recording.meta.get('camera')}, slots {recording.meta['slots']}")
+    for position in range(len(recording)):
+        entry = recording.entry(position)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["timestamp"]))
+        print(f"{entry['frame']:6d}  {stamp}  {entry['width']}x{entry['height']}  "
+              f"log offset {entry['log_offset']:>10d}  {entry['image_id'].decode('utf-8')}")
+        if args.export:
+            import cv2
+
+            os.makedirs(args.export, exist_ok=True)
+            cv2.imwrite(os.path.join(args.export, f"{entry['frame']:06d}.png"), recording.image(position))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import collections
+import threading
+import time
+
+import cv2
+
+# A captured frame: running frame number, capture time (time.time()) and the BGR image
+Frame = collections.namedtuple("Frame", ["index", "timestamp", "image"])
+
+
+class CaptureThread:
+    """
+    Reads a camera continuously on its own thread and keeps the newest frames in a small ring buffer.
+
+    The VideoCapture object is only ever touched by the capture thread, so the Tk thread can grab
+    `latest()` at any time without blocking on the driver or receiving a frame that sat in the
+    driver's queue. Resolution changes are handed to the thread and only renegotiated with the
+    driver when the requested size actually differs from the current one.
+    """
+
+    def __init__(self, index, api_preference=cv2.CAP_ANY, width=1280, height=720, buffer_size=4):
+        self.index = index
+        self.api_preference = api_preference
+        self.buffer_size = buffer_size
+
+        self._frames = collections.deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._requested_size = (width, height)
+        self._current_size = None
+        self._frame_count = 0
+        self._running = False
+        self._thread = None
+        self._opened = threading.Event()
+        self._cap = None
+
+    def start(self, timeout=5.0):
+        """
+        Open the camera on the capture thread and return True once it delivers frames.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.index}", daemon=True)
+        self._thread.start()
+        return self.wait_opened(timeout)
+
+    def wait_opened(self, timeout=5.0):
+        # Lets several cameras be started with timeout=0 and then waited for together
+        self._opened.wait(timeout)
+        return self.is_opened()
+
+    def is_opened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def set_resolution(self, width, height):
+        # Picked up by the capture thread; a no-op when the size is unchanged
+        with self._lock:
+            self._requested_size = (width, height)
+
+    @property
+    def resolution(self):
+        return self._current_size
+
+    def latest(self):
+        """
+        Return the newest Frame without waiting, or None if nothing has been captured yet.
+        """
+        with self._lock:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, after_index=-1, timeout=1.0):
+        """
+        Block until a frame newer than `after_index` is available and return it (None on timeout).
+        """
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            while not self._frames or self._frames[-1].index <= after_index:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._frame_ready.wait(remaining)
+            return self._frames[-1]
+
+    def frames(self):
+        # Snapshot of the ring buffer, oldest first
+        with self._lock:
+            return list(self._frames)
+
+    def _apply_resolution(self):
+        with self._lock:
+            requested = self._requested_size
+        if requested == self._current_size:
+            return
+        width, height = requested
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self._current_size = (int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                              int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        # Frames captured at the previous resolution are no longer valid
+        with self._lock:
+            self._frames.clear()
+        print(f"Camera {self.index} resolution set to {self._current_size[0]} x {self._current_size[1]}")
+
+    def _run(self):
+        self._cap = cv2.VideoCapture(self.index, self.api_preference)
+        if not self._cap.isOpened():
+            print(f"Error: Unable to open camera {self.index}")
+            self._opened.set()
+            return
+
+        # Keep the driver queue as short as possible so reads return fresh frames
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            while self._running:
+                self._apply_resolution()
+                ret, image = self._cap.read()
+                if not ret:
+                    time.sleep(0.01)
+                    continue
+                frame = Frame(self._frame_count, time.time(), image)
+                self._frame_count += 1
+                with self._frame_ready:
+                    self._frames.append(frame)
+                    self._frame_ready.notify_all()
+                self._opened.set()
+        finally:
+            self._cap.release()
+            self._opened.set()
+            with self._frame_ready:
+                self._frame_ready.notify_all()
@@ -0,0 +1,63 @@
+import os
+import queue
+import threading
+
+import cv2
+
+# Default encoder settings per codec; PNG/BMP/TIFF keep the exact pixels the model saw
+DEFAULT_PARAMS = {
+    ".png": [cv2.IMWRITE_PNG_COMPRESSION, 1],  # Lossless, favour speed over size
+    ".bmp": [],
+    ".tiff": [],
+    ".jpg": [cv2.IMWRITE_JPEG_QUALITY, 95],
+    ".webp": [cv2.IMWRITE_WEBP_QUALITY, 101],  # Quality above 100 selects lossless WebP
+}
+
+
+class ImageWriter:
+    """
+    Encode and write images on a background thread so saving never delays inference or display.
+
+    Jobs are queued with `save(image, stem)`; when the queue is full the image is dropped instead
+    of blocking the caller.
+    """
+
+    def __init__(self, codec=".png", params=None, max_queue=16):
+        if codec not in DEFAULT_PARAMS and params is None:
+            raise ValueError(f"Unsupported codec {codec!r}, expected one of {sorted(DEFAULT_PARAMS)}")
+        self.codec = codec
+        self.params = DEFAULT_PARAMS.get(codec, []) if params is None else params
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, image, stem):
+        """
+        Queue `image` to be written to `stem + codec`. Returns the target path, or None if dropped.
+        """
+        path = stem + self.codec
+        try:
+            self._queue.put_nowait((image, path))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Image writer busy, dropped {path}")
+            return None
+        return path
+
+    def close(self, timeout=5.0):
+        # Finish pending writes, then stop the thread
+        self._queue.put((None, None))
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            image, path = self._queue.get()
+            if image is None:
+                break
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if not cv2.imwrite(path, image, self.params):
+                print(f"Failed to write {path}")
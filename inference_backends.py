@@ -0,0 +1,241 @@
+"""
+CPU inference backends for the OBB model.
+
+Every backend is an ultralytics `YOLO` object, so callers keep getting the same `Results` (with
+`obb.xywhr`, `obb.conf`, `obb.cls`) and `plot()` regardless of the runtime underneath:
+
+    torch     the .pt weight, run by PyTorch
+    onnx      exported to ONNX (conv/BN fused, graph simplified) and run by ONNX Runtime
+    openvino  exported to OpenVINO IR and run by OpenVINO
+
+Exported artifacts are cached under `exports/<weight hash>/`, so a weight is only exported once.
+
+Example:
+    python inference_backends.py weights/bestV3-OBB.pt --backend onnx --int8 --parity img/77_Color.png
+"""
+import argparse
+import hashlib
+import os
+import shutil
+
+import numpy as np
+
+from detections import to_numpy
+from obb_geometry import as_boxes, iou_matrix
+
+BACKENDS = ("torch", "onnx", "openvino")
+EXPORT_DIR = "exports"
+DEFAULT_WEIGHT_PATH = os.path.join("weights", "bestV3-OBB.pt")
+# Environment variable overriding the default weight
+WEIGHTS_ENV = "BINPICK_WEIGHTS"
+
+
+def resolve_weight_path(weight_path=None):
+    """
+    Return `weight_path`, else $BINPICK_WEIGHTS, else DEFAULT_WEIGHT_PATH, with either path separator
+    accepted. A relative path that does not exist from the working directory is looked up next to
+    this module, so the weights are found however the app is started.
+    """
+    weight_path = weight_path or os.environ.get(WEIGHTS_ENV) or DEFAULT_WEIGHT_PATH
+    weight_path = os.path.expanduser(weight_path).replace("\\", "/").replace("/", os.sep)
+    if not os.path.isabs(weight_path) and not os.path.exists(weight_path):
+        beside = os.path.join(os.path.dirname(os.path.abspath(__file__)), weight_path)
+        if os.path.exists(beside):
+            return beside
+    return weight_path
+
+
+def weight_hash(weight_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(weight_path, "rb") as weight_file:
+        for chunk in iter(lambda: weight_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def export_model(weight_path, backend="onnx", int8=False, imgsz=640, cache_dir=EXPORT_DIR, data=None):
+    """
+    Export `weight_path` for `backend` and return the path of the cached artifact.
+
+    ONNX int8 uses ONNX Runtime dynamic quantization (no calibration data needed); OpenVINO int8
+    uses ultralytics/NNCF post-training quantization and needs a dataset yaml in `data`.
+    """
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Nothing to export for backend {backend!r}")
+
+    stem = os.path.splitext(os.path.basename(weight_path))[0]
+    target_dir = os.path.join(cache_dir, weight_hash(weight_path))
+    # "dyn": exported with a dynamic batch axis; older batch-1 artifacts are not reused
+    suffix = f"-{imgsz}-dyn" + ("-int8" if int8 else "")
+    target = os.path.join(target_dir, f"{stem}{suffix}.onnx" if backend == "onnx" else f"{stem}{suffix}_openvino_model")
+    if os.path.exists(target):
+        return target
+    os.makedirs(target_dir, exist_ok=True)
+
+    from ultralytics import YOLO
+
+    model = YOLO(weight_path)
+    if backend == "onnx":
+        # ultralytics fuses Conv+BN before export; simplify folds constants in the graph. The batch
+        # axis is dynamic because batch_detect, the GUI worker, RoiTiler and the server send batches
+        exported = model.export(format="onnx", imgsz=imgsz, simplify=True, dynamic=True)
+        if int8:
+            quantize_onnx(exported, target)
+            os.remove(exported)
+        else:
+            shutil.move(exported, target)
+    else:
+        exported = model.export(format="openvino", imgsz=imgsz, int8=int8, data=data, dynamic=True)
+        shutil.move(exported, target)
+    print(f"Exported {weight_path} to {target}")
+    return target
+
+
+def quantize_onnx(src, dst):
+    """
+    Dynamic int8 quantization of an ONNX model, keeping the ultralytics metadata (task, names,
+    stride, imgsz) that the loader needs.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+    source, quantized = onnx.load(src), onnx.load(dst)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, dst)
+
+
+def default_threads():
+    # Physical cores are usually the sweet spot for intra-op parallelism on these CPUs
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def load_model(weight_path, backend="torch", threads=None, int8=False, imgsz=640):
+    """
+    Return a YOLO object for `weight_path` running on `backend`, with `threads` intra-op threads.
+
+    PyTorch keeps its own thread count unless `threads` is given: it already sizes its pool to the
+    physical cores, and the process-wide setting would also apply to every other torch user.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    # Imported on first use: ultralytics pulls in torch, which takes seconds on a cold start
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        return YOLO(weight_path)
+
+    threads = threads or default_threads()
+    artifact = export_model(weight_path, backend, int8=int8, imgsz=imgsz)
+    model = YOLO(artifact, task="obb")
+    # The runtime session is created with the predictor on the first call
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    if backend == "onnx":
+        _tune_onnx_session(model, artifact, threads)
+    else:
+        _tune_openvino_model(model, artifact, threads)
+    return model
+
+
+def _tune_onnx_session(model, artifact, threads):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    try:
+        model.predictor.model.session = ort.InferenceSession(artifact, options, providers=["CPUExecutionProvider"])
+    except AttributeError:
+        print("Warning: could not tune the ONNX Runtime session, using ultralytics defaults")
+
+
+def _tune_openvino_model(model, artifact, threads):
+    import openvino as ov
+
+    xml = next(os.path.join(artifact, f) for f in os.listdir(artifact) if f.endswith(".xml"))
+    core = ov.Core()
+    config = {"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": threads}
+    try:
+        model.predictor.model.ov_compiled_model = core.compile_model(core.read_model(xml), "CPU", config)
+    except AttributeError:
+        print("Warning: could not tune the OpenVINO model, using ultralytics defaults")
+
+
+def check_parity(weight_path, backend, images, conf=0.25, min_iou=0.9, max_conf_diff=0.05, imgsz=640, int8=False):
+    """
+    Compare `backend` with the PyTorch model on `images` (list of BGR arrays).
+
+    Every box of either model must have a same-class partner with rotated IoU >= min_iou and a
+    confidence within max_conf_diff. The images are also run through `backend` as one batch (of at
+    least two), as the batched callers do. Returns a dict with the per-image counts, the batch
+    counts and an overall "ok".
+    """
+    from ultralytics import YOLO
+
+    reference = YOLO(weight_path)
+    candidate = load_model(weight_path, backend, int8=int8, imgsz=imgsz)
+
+    report = {"backend": backend, "images": [], "batch": [], "ok": True}
+    expected = [to_numpy(reference(image, conf=conf, imgsz=imgsz, verbose=False)) for image in images]
+    for image, image_expected in zip(images, expected):
+        actual = to_numpy(candidate(image, conf=conf, imgsz=imgsz, verbose=False))
+        report["images"].append(compare_detections(image_expected, actual, min_iou, max_conf_diff))
+
+    # One batched call, so a model exported with a fixed batch of 1 fails here rather than in production
+    batch = list(images) if len(images) > 1 else list(images) * 2
+    batch_expected = expected if len(images) > 1 else expected * 2
+    results = candidate(batch, conf=conf, imgsz=imgsz, verbose=False)
+    for image_expected, result in zip(batch_expected, results):
+        report["batch"].append(compare_detections(image_expected, to_numpy([result]), min_iou, max_conf_diff))
+
+    report["ok"] = all(result["ok"] for result in report["images"] + report["batch"])
+    return report
+
+
+def compare_detections(expected, actual, min_iou=0.9, max_conf_diff=0.05):
+    # Match every expected box to its best same-class box in `actual`
+    ious = iou_matrix(as_boxes(expected), as_boxes(actual))
+    ious[expected["class_id"][:, None] != actual["class_id"][None, :]] = 0.0
+    matched = 0
+    worst_conf = 0.0
+    if ious.size:
+        best = ious.argmax(axis=1)
+        hits = ious[np.arange(len(expected)), best] >= min_iou
+        matched = int(hits.sum())
+        if matched:
+            worst_conf = float(np.abs(expected["confidence"][hits] - actual["confidence"][best[hits]]).max())
+    ok = matched == len(expected) == len(actual) and worst_conf <= max_conf_diff
+    return {"expected": len(expected), "actual": len(actual), "matched": matched, "max_conf_diff": worst_conf, "ok": ok}
+
+
+def main():
+    import cv2
+
+    parser = argparse.ArgumentParser(description="Export a .pt weight for a CPU backend and check it against PyTorch.")
+    parser.add_argument("weights", help="YOLO OBB .pt weight")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Export an int8-quantized variant")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--data", help="Dataset yaml for OpenVINO int8 calibration")
+    parser.add_argument("--parity", nargs="*", default=[], help="Images to compare against the PyTorch model")
+    args = parser.parse_args()
+
+    print(export_model(args.weights, args.backend, int8=args.int8, imgsz=args.imgsz, data=args.data))
+    if args.parity:
+        report = check_parity(args.weights, args.backend, [cv2.imread(p) for p in args.parity],
+                              imgsz=args.imgsz, int8=args.int8)
+        for path, result in zip(args.parity, report["images"]):
+            print(f"{path}: {result}")
+        print(f"Batch of {len(report['batch'])}: {sum(result['ok'] for result in report['batch'])} image(s) OK")
+        print("Parity OK" if report["ok"] else "Parity FAILED")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import collections
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from detections import DETECTION_DTYPE, class_names, to_numpy
+
+# A finished job, handed back to the Tk thread through InferenceWorker.poll()
+InferenceResult = collections.namedtuple(
+    "InferenceResult", ["job_id", "key", "frame", "results", "dets", "annotated", "weight_path", "names", "meta", "error", "elapsed",
+                        "batch_size", "gate"])
+
+
+def region_input(frame, crop, scale, stride=32, pad_value=114):
+    """
+    Return the image and imgsz to run `crop` (x0, y0, x1, y1) of `frame` through the model at
+    `scale`, the same scale as the full-frame path. The letterbox resizes the long side to imgsz,
+    which is rounded up to the stride, so the crop's long side is padded to match; otherwise a
+    small region would be enlarged to the full input size and its parts seen at another scale.
+    """
+    x0, y0, x1, y1 = crop
+    image = frame[y0:y1, x0:x1]
+    height, width = image.shape[:2]
+    imgsz = max(stride, int(np.ceil(max(height, width) * scale / stride)) * stride)
+    side = max(height, width, int(round(imgsz / scale)))
+    if side > max(height, width):
+        shape = (side, width) if height >= width else (height, side)
+        padded = np.full(shape + image.shape[2:], pad_value, dtype=image.dtype)
+        padded[:height, :width] = image
+        image = padded
+    return image, imgsz
+
+
+class InferenceWorker:
+    """
+    Runs YOLO inference and OBB extraction (and optionally full-resolution plotting) on a
+    background thread.
+
+    The Tk thread submits frames with `submit()` and collects finished jobs with `poll()` from a
+    `root.after` loop, so widgets are only ever touched on the main thread. Each key (camera,
+    import, ...) has a single pending slot: submitting a newer frame replaces a job that has not
+    started yet, so the worker always processes the freshest frame instead of working through a
+    backlog.
+
+    Pending jobs of different keys (one per camera) are run together as one batched model call of
+    up to `max_batch` frames. When fewer jobs are waiting, the worker gives the other streams
+    `batch_window` seconds to submit theirs before it starts; each result is still handed back
+    under its own key. With a `tiler`, each frame is instead split into its ROI tiles, which are
+    batched together (no plotted image is produced then).
+
+    With a ChangeGate, frames that did not change since the last inferred frame of their key are
+    answered from the gate's cached detections, and frames with a small change only re-infer the
+    changed region; the result's `gate` field says which ("reuse", "region" or "full"). Those
+    results carry no `results`/`annotated`. Regions are run at the same input scale as full
+    frames (or tiles), and with a tiler they are clipped to its ROI. The gate is invalidated when the model changes.
+
+    `model` may be None while the first weight is still loading; submitted jobs then wait for
+    `set_model()`.
+    """
+
+    def __init__(self, model, weight_path=None, conf=0.8, annotate=False, max_batch=1, batch_window=0.005, tiler=None,
+                 gate=None, imgsz=640):
+        self.conf = conf
+        self.imgsz = imgsz  # Model input size; frames (or tiles) are letterboxed to it
+        self.annotate = annotate
+        self.tiler = tiler  # Optional RoiTiler: detect on ROI crops/tiles instead of the full frame
+        self.gate = gate  # Optional ChangeGate: skip inference for unchanged frames
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.dropped = 0  # Jobs replaced by a newer frame before they ran
+
+        self._model = model
+        self._weight_path = weight_path
+        self._names = class_names(model.names if model is not None else [])
+        self._ids = itertools.count()
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._results = queue.Queue()
+        self._running_keys = set()  # Keys of the batch currently on the model
+        self._generation = 0  # Bumped on every model change, so stale results do not refill the gate
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+        self._thread.start()
+
+    def set_model(self, model, weight_path=None):
+        # Takes effect from the next job; a job already running finishes on the old model
+        names = class_names(model.names)
+        with self._lock:
+            self._model = model
+            self._weight_path = weight_path
+            self._names = names
+            self._generation += 1
+            self._wakeup.notify()
+        if self.gate is not None:
+            self.gate.invalidate()  # Cached detections came from the previous weight
+
+    def submit(self, frame, key="main", **meta):
+        """
+        Queue `frame` for inference and return its job id. Extra keyword arguments are returned
+        untouched in the result's `meta`.
+        """
+        with self._wakeup:
+            job_id = next(self._ids)
+            if key in self._pending:
+                self.dropped += 1
+                del self._pending[key]
+            self._pending[key] = (job_id, frame, meta)
+            self._wakeup.notify()
+        return job_id
+
+    def is_idle(self, key=None):
+        # With a key, only that stream's slot is checked
+        with self._lock:
+            if key is not None:
+                return key not in self._pending and key not in self._running_keys
+            return not self._running_keys and not self._pending
+
+    def poll(self):
+        """
+        Return all finished results without blocking (call from the Tk thread).
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def stop(self):
+        with self._wakeup:
+            self._running = False
+            self._pending.clear()
+            self._wakeup.notify()
+        self._thread.join(timeout=5.0)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                # Jobs submitted before the first model is loaded wait for set_model()
+                while self._running and (not self._pending or self._model is None):
+                    self._wakeup.wait()
+                if not self._running:
+                    return
+                # Let the other streams catch up so their frames share this model call
+                deadline = time.monotonic() + self.batch_window
+                while self._running and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                if not self._running:
+                    return
+                jobs = [self._pending.popitem(last=False) for _ in range(min(self.max_batch, len(self._pending)))]
+                model, weight_path, names, tiler = self._model, self._weight_path, self._names, self.tiler
+                generation, gate = self._generation, self.gate
+                self._running_keys = {key for key, _ in jobs}
+
+            thumbnails = None
+            if gate is not None:
+                jobs, thumbnails = self._run_gate(jobs, model, gate, weight_path, names, tiler)
+            # The gate snapshot is used throughout: the Tk thread may switch it off meanwhile
+            if jobs and tiler is not None:
+                self._run_tiled(jobs, model, tiler, weight_path, names, thumbnails, generation, gate)
+            elif jobs:
+                self._run_batch(jobs, model, weight_path, names, thumbnails, generation, gate)
+            with self._lock:
+                self._running_keys = set()
+
+    def _run_gate(self, jobs, model, gate, weight_path, names, tiler=None):
+        """
+        Answer unchanged and slightly changed frames through the gate and return the jobs that
+        need a full inference, with their gate thumbnails by job id.
+        """
+        full_jobs = []
+        thumbnails = {}
+        for key, (job_id, frame, meta) in jobs:
+            start = time.perf_counter()
+            with metrics.timed("gate"):
+                decision, small = gate.check(frame, key)
+            metrics.increment(f"gate_{decision.action}")
+            if decision.action == "full":
+                thumbnails[job_id] = small
+                full_jobs.append((key, (job_id, frame, meta)))
+                continue
+
+            dets, error = decision.dets, None
+            if decision.action == "region":
+                # Only the part of the change inside the tiler's ROI is detected, like full frames
+                crop = tiler.clip(decision.region, frame.shape) if tiler is not None else decision.region
+                try:
+                    region_dets = np.empty(0, dtype=DETECTION_DTYPE)
+                    if crop is not None:
+                        x0, y0, x1, y1 = crop
+                        image, imgsz = region_input(frame, crop, self.input_scale(frame.shape, tiler))
+                        with metrics.timed("inference"):
+                            region_dets = to_numpy(model(image, conf=self.conf, imgsz=imgsz))
+                        region_dets["x"] += x0
+                        region_dets["y"] += y0
+                    dets = gate.merge(key, frame.shape, small, decision.region, region_dets)
+                except Exception as exc:
+                    dets, error = None, exc
+            self._results.put(InferenceResult(job_id, key, frame, None, dets, None, weight_path, names, meta, error,
+                                              time.perf_counter() - start, 1, decision.action))
+        return full_jobs, thumbnails
+
+    def input_scale(self, frame_shape, tiler=None):
+        # Model input pixels per frame pixel on the full-frame (or tile) path
+        if tiler is not None:
+            windows, _ = tiler.windows(frame_shape)
+            x0, y0, x1, y1 = windows[0].tolist()
+            return self.imgsz / max(x1 - x0, y1 - y0)
+        return self.imgsz / max(frame_shape[:2])
+
+    def _publish(self, result, thumbnails, generation, gate=None):
+        # Full-frame results become the gate's new reference, unless the model changed meanwhile
+        small = thumbnails.get(result.job_id) if thumbnails else None
+        if small is not None and gate is not None:
+            result = result._replace(gate="full")
+            with self._lock:
+                current = self._generation == generation
+            if current and result.error is None and result.dets is not None:
+                gate.update(result.key, result.frame.shape, small, result.dets)
+        self._results.put(result)
+
+    def _run_batch(self, jobs, model, weight_path, names, thumbnails=None, generation=None, gate=None):
+        start = time.perf_counter()
+        batch = error = None
+        try:
+            frames = [frame for _, (_, frame, _) in jobs]
+            with metrics.timed("inference"):
+                batch = model(frames if len(frames) > 1 else frames[0], conf=self.conf, imgsz=self.imgsz)
+        except Exception as exc:  # Reported on the Tk thread instead of killing the worker
+            error = exc
+
+        for position, (key, (job_id, frame, meta)) in enumerate(jobs):
+            results = dets = annotated = None
+            job_error = error
+            if batch is not None:
+                try:
+                    results = [batch[position]]
+                    with metrics.timed("extract"):
+                        dets = to_numpy(results)
+                    if self.annotate:
+                        with metrics.timed("plot"):
+                            annotated = results[0].plot()
+                except Exception as exc:
+                    job_error = exc
+            elapsed = time.perf_counter() - start
+            self._publish(InferenceResult(job_id, key, frame, results, dets, annotated, weight_path, names, meta,
+                                          job_error, elapsed, len(jobs), None), thumbnails, generation, gate)
+
+    def _run_tiled(self, jobs, model, tiler, weight_path, names, thumbnails=None, generation=None, gate=None):
+        # The tiles of each frame form the batch; results are merged into frame coordinates
+        for key, (job_id, frame, meta) in jobs:
+            start = time.perf_counter()
+            dets = error = None
+            try:
+                with metrics.timed("inference"):
+                    dets = tiler.detect(model, frame, self.conf, imgsz=self.imgsz)
+            except Exception as exc:
+                error = exc
+            self._publish(InferenceResult(job_id, key, frame, None, dets, None, weight_path, names, meta,
+                                          error, time.perf_counter() - start, 1, None), thumbnails, generation, gate)
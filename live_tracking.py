@@ -0,0 +1,125 @@
+import collections
+import itertools
+import time
+
+import numpy as np
+
+from detections import DETECTION_DTYPE
+
+
+class RateMeter:
+    """
+    Events per second over a sliding time window.
+    """
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.total = 0
+        self._events = collections.deque()  # (timestamp, count)
+
+    def tick(self, count=1, now=None):
+        now = time.monotonic() if now is None else now
+        self._events.append((now, count))
+        self.total += count
+        self._trim(now)
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        if not self._events:
+            return 0.0
+        span = max(now - self._events[0][0], 1e-3)
+        return sum(count for _, count in self._events) / span if len(self._events) > 1 else 0.0
+
+    def _trim(self, now):
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+
+class DetectionTracker:
+    """
+    Carries detections across frames that were not sent to the model.
+
+    Each inference result is associated with the current tracks by greedy nearest-center matching
+    within `max_distance` pixels (same class only). Matched tracks update their position and a
+    smoothed velocity; unmatched detections start new tracks and tracks that are not seen for
+    `max_age` seconds are dropped. `predict(t)` returns every live track moved along its velocity
+    to time `t`, as a DETECTION_DTYPE array, so overlays follow the parts between inferences.
+    """
+
+    def __init__(self, max_distance=40.0, max_age=1.0, smoothing=0.5):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.smoothing = smoothing
+
+        self._ids = itertools.count()
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self._dets = np.zeros(0, dtype=DETECTION_DTYPE)
+        self._velocity = np.zeros((0, 2))
+        self._seen = np.zeros(0)
+
+    def reset(self):
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self._dets = np.zeros(0, dtype=DETECTION_DTYPE)
+        self._velocity = np.zeros((0, 2))
+        self._seen = np.zeros(0)
+
+    def update(self, dets, timestamp):
+        """
+        Associate a new inference result (taken at `timestamp`) with the tracks and return the
+        track id of every detection.
+        """
+        # Forget tracks that have not been seen for too long
+        alive = timestamp - self._seen <= self.max_age
+        self.track_ids, self._dets = self.track_ids[alive], self._dets[alive]
+        self._velocity, self._seen = self._velocity[alive], self._seen[alive]
+
+        count = len(dets)
+        previous = self.predict(timestamp)
+        unmatched = np.ones(len(previous), dtype=bool)
+        ids = np.full(count, -1, dtype=np.int64)
+        velocity = np.zeros((count, 2))
+
+        if count and len(previous):
+            new_xy = np.stack([dets["x"], dets["y"]], axis=1).astype(np.float64)
+            old_xy = np.stack([previous["x"], previous["y"]], axis=1).astype(np.float64)
+            distance = np.hypot(*(new_xy[:, None, :] - old_xy[None, :, :]).transpose(2, 0, 1))
+            distance[dets["class_id"][:, None] != previous["class_id"][None, :]] = np.inf
+
+            # Greedy matching, closest pairs first
+            rows, cols = np.unravel_index(np.argsort(distance, axis=None), distance.shape)
+            used_rows, used_cols = set(), set()
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                if distance[row, col] > self.max_distance:
+                    break
+                if row in used_rows or col in used_cols:
+                    continue
+                used_rows.add(row)
+                used_cols.add(col)
+                unmatched[col] = False
+                ids[row] = self.track_ids[col]
+                dt = timestamp - self._seen[col]
+                if dt > 0:
+                    measured = (new_xy[row] - np.array([self._dets["x"][col], self._dets["y"][col]])) / dt
+                    velocity[row] = self.smoothing * measured + (1 - self.smoothing) * self._velocity[col]
+
+        for row in np.nonzero(ids < 0)[0]:
+            ids[row] = next(self._ids)
+
+        # Tracks not matched this time are kept (coasting) until they are too old
+        self.track_ids = np.concatenate([ids, self.track_ids[unmatched]])
+        self._dets = np.concatenate([np.asarray(dets, dtype=DETECTION_DTYPE), self._dets[unmatched]])
+        self._velocity = np.concatenate([velocity, self._velocity[unmatched]])
+        self._seen = np.concatenate([np.full(count, timestamp), self._seen[unmatched]])
+        return ids
+
+    def predict(self, timestamp):
+        """
+        Tracks moved to `timestamp` along their velocity, as a DETECTION_DTYPE array.
+        """
+        alive = timestamp - self._seen <= self.max_age
+        predicted = self._dets[alive].copy()
+        dt = np.maximum(timestamp - self._seen[alive], 0.0)
+        predicted["x"] += self._velocity[alive, 0] * dt
+        predicted["y"] += self._velocity[alive, 1] * dt
+        return predicted
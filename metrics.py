@@ -0,0 +1,207 @@
+"""
+In-memory timing histograms for the detection pipeline.
+
+Code paths wrap their stages in `metrics.timed("stage")`; while the registry is disabled this
+returns a shared no-op context manager, so the hooks cost one attribute check. When enabled, the
+durations go into fixed-bucket histograms that can be read back as quantiles (for the GUI status
+panel) or served in Prometheus text format by `MetricsServer`:
+
+    curl http://127.0.0.1:9100/metrics
+"""
+import bisect
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, from sub-millisecond log writes to multi-second model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "binpick_"
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations in seconds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self):
+        # Per-bucket counts (not cumulative), count and sum, read consistently
+        with self._lock:
+            return list(self._counts), self.count, self.sum, self.max
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile (0..1) by interpolating inside its bucket; None when empty.
+        """
+        counts, total, _, maximum = self.snapshot()
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                return lower + (min(upper, maximum) - lower) * (rank - cumulative) / count
+            cumulative += count
+        return maximum
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named stage histograms and event counters, disabled by default.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text=None):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self.buckets))
+                if help_text:
+                    self._help[name] = help_text
+        return histogram
+
+    def timed(self, name):
+        """
+        Context manager timing the block into histogram `name`; a no-op while disabled.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def stages(self):
+        # (name, histogram) pairs in the order the stages were first seen
+        with self._lock:
+            return list(self._histograms.items())
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def prometheus_text(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, histogram in self.stages():
+            metric = f"{PREFIX}{name}_seconds"
+            counts, total, total_sum, _ = histogram.snapshot()
+            lines.append(f"# HELP {metric} {self._help.get(name, f'Duration of the {name} stage')}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {total}')
+            lines.append(f"{metric}_sum {total_sum!r}")
+            lines.append(f"{metric}_count {total}")
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for name, value in counters:
+            metric = f"{PREFIX}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves a registry on http://host:port/metrics from a daemon thread. Binds to localhost by default.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # Resolves port 0 to the one picked by the OS
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        print(f"Metrics served on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Shared by the app and its worker threads
+registry = MetricsRegistry()
+timed = registry.timed
+observe = registry.observe
+increment = registry.increment
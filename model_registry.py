@@ -0,0 +1,149 @@
+import collections
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from inference_backends import load_model
+
+
+def model_size_bytes(model, weight_path=None):
+    """
+    Approximate memory held by a loaded model: its parameter and buffer tensors, or the weight
+    file size when the model does not expose them.
+    """
+    try:
+        module = model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except (AttributeError, TypeError):
+        return os.path.getsize(weight_path) if weight_path and os.path.exists(weight_path) else 0
+
+
+class ModelRegistry:
+    """
+    LRU cache of loaded YOLO models with background loading.
+
+    `load(path, backend)` returns a concurrent.futures.Future that resolves to a ready model
+    (see inference_backends for the backends; each weight/backend pair is cached separately). Models are
+    loaded and warmed up (one dummy inference, so the first real frame does not pay for predictor
+    setup) on a single loader thread, so the Tk thread never blocks; the caller polls the future
+    and swaps the model in once it is done. Switching back to a cached weight resolves immediately.
+    The least recently used models are evicted once more than `max_models` are cached or their
+    combined size exceeds `max_bytes`. The model in use by the caller stays referenced by the
+    caller, so eviction only drops the registry's copy.
+
+    ultralytics (and torch) are only imported by the first load, on the loader thread, so
+    importing this module is cheap. `stage(path, backend)` tells what a pending load is doing,
+    for a progress indicator.
+    """
+
+    def __init__(self, max_models=3, max_bytes=1024 ** 3, warmup_size=(640, 640)):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.warmup_size = warmup_size
+
+        self._models = collections.OrderedDict()  # key -> (model, size in bytes)
+        self._pending = {}  # key -> Future of a load in progress
+        self._stages = {}  # key -> what the load in progress is doing
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+    @staticmethod
+    def key(weight_path, backend="torch"):
+        return os.path.normcase(os.path.abspath(weight_path)), backend
+
+    def get(self, weight_path, backend="torch"):
+        """
+        Return the cached model for `weight_path` on `backend` (marking it most recently used) or None.
+        """
+        key = self.key(weight_path, backend)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+            self._models.move_to_end(key)
+            return entry[0]
+
+    def load(self, weight_path, backend="torch"):
+        """
+        Return a Future resolving to the loaded, warmed-up model for `weight_path` on `backend`.
+        """
+        key = self.key(weight_path, backend)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                future = Future()
+                future.set_result(entry[0])
+                return future
+            # Several requests for the same weight share one load
+            if key in self._pending:
+                return self._pending[key]
+            future = self._executor.submit(self._load, key, weight_path, backend)
+            self._pending[key] = future
+            return future
+
+    def stage(self, weight_path, backend="torch"):
+        # "importing ultralytics", "loading" or "warming up" while a load is in progress, else None
+        with self._lock:
+            return self._stages.get(self.key(weight_path, backend))
+
+    def cached(self):
+        # Cached weight keys, least recently used first
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self, key, weight_path, backend):
+        try:
+            started = time.perf_counter()
+            if "ultralytics" not in sys.modules:
+                self._set_stage(key, "importing ultralytics")
+                import ultralytics  # Timed on its own, apart from loading the weight
+
+                elapsed = time.perf_counter() - started
+                metrics.observe("import_ultralytics", elapsed)
+                print(f"ultralytics imported in {elapsed:.2f} s")
+            self._set_stage(key, "loading")
+            model = load_model(weight_path, backend)
+            self._set_stage(key, "warming up")
+            self.warm_up(model)
+            metrics.observe("model_load", time.perf_counter() - started)
+            size = model_size_bytes(model, weight_path)
+            with self._lock:
+                self._models[key] = (model, size)
+                self._models.move_to_end(key)
+                self._evict()
+            print(f"Model {weight_path} loaded on {backend} ({size / 1024 ** 2:.1f} MB)")
+            return model
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._stages.pop(key, None)
+
+    def _set_stage(self, key, stage):
+        with self._lock:
+            self._stages[key] = stage
+
+    def warm_up(self, model):
+        # One inference on a blank frame builds the predictor and primes the backend
+        width, height = self.warmup_size
+        model(np.zeros((height, width, 3), dtype=np.uint8), verbose=False)
+
+    def _evict(self):
+        total = sum(size for _, size in self._models.values())
+        while len(self._models) > 1 and (len(self._models) > self.max_models or total > self.max_bytes):
+            evicted, (_, size) = self._models.popitem(last=False)
+            total -= size
+            print(f"Model {evicted} evicted from cache")
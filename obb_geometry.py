@@ -0,0 +1,166 @@
+import numpy as np
+
+
+def as_boxes(dets):
+    """
+    Return an (N, 5) float64 array of (x, y, w, h, r) from a DETECTION_DTYPE array or an (N, 5) array.
+    """
+    if dets.dtype.names:
+        return np.stack([dets["x"], dets["y"], dets["w"], dets["h"], dets["r"]], axis=1).astype(np.float64)
+    return np.asarray(dets, dtype=np.float64).reshape(-1, 5)
+
+
+def obb_corners(boxes):
+    """
+    Corners of (N, 5) xywhr boxes as an (N, 4, 2) array in counter-clockwise order.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    cos, sin = np.cos(boxes[:, 4]), np.sin(boxes[:, 4])
+    # Half extents along the box's own axes
+    ux = np.stack([cos, sin], axis=1) * (boxes[:, 2:3] / 2)
+    uy = np.stack([-sin, cos], axis=1) * (boxes[:, 3:4] / 2)
+    center = boxes[:, :2]
+    return np.stack([center + ux + uy, center - ux + uy, center - ux - uy, center + ux - uy], axis=1)
+
+
+def circumradius(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    return 0.5 * np.hypot(boxes[:, 2], boxes[:, 3])
+
+
+def _local_corners(boxes, frames):
+    """
+    Corners of `boxes` expressed in the local frame (center, axes) of `frames`, row by row, as two
+    (N, 4) arrays in a consistent winding order.
+    """
+    angle = boxes[:, 4:5] - frames[:, 4:5]
+    cos, sin = np.cos(angle), np.sin(angle)
+    frame_cos, frame_sin = np.cos(frames[:, 4:5]), np.sin(frames[:, 4:5])
+    dx, dy = boxes[:, 0:1] - frames[:, 0:1], boxes[:, 1:2] - frames[:, 1:2]
+    center_x = dx * frame_cos + dy * frame_sin
+    center_y = dy * frame_cos - dx * frame_sin
+    half_w = _SIGN_W * boxes[:, 2:3] / 2
+    half_h = _SIGN_H * boxes[:, 3:4] / 2
+    return center_x + half_w * cos - half_h * sin, center_y + half_w * sin + half_h * cos
+
+
+def _clip_to_slab(start, delta, half):
+    # Liang-Barsky: parameter range [lo, hi] of start + t * delta inside |x| < half
+    moving = np.abs(delta) > 1e-12
+    safe = np.where(moving, delta, 1.0)
+    t_a = (-half - start) / safe
+    t_b = (half - start) / safe
+    inside = np.abs(start) < half
+    lo = np.where(moving, np.minimum(t_a, t_b), np.where(inside, -np.inf, np.inf))
+    hi = np.where(moving, np.maximum(t_a, t_b), np.where(inside, np.inf, -np.inf))
+    return lo, hi
+
+
+def _boundary_inside(xs, ys, along, across, half_w, half_h):
+    """
+    Shoelace contribution of the edges of polygon (xs, ys) clipped to a rectangle.
+
+    (along, across) are the same corners in the rectangle's own frame, which is where the clipping
+    parameters are found; the contribution is measured with (xs, ys).
+    """
+    lo_x, hi_x = _clip_to_slab(along, np.roll(along, -1, axis=1) - along, half_w)
+    lo_y, hi_y = _clip_to_slab(across, np.roll(across, -1, axis=1) - across, half_h)
+    t0 = np.clip(np.maximum(lo_x, lo_y), 0.0, 1.0)
+    t1 = np.clip(np.minimum(hi_x, hi_y), t0, 1.0)  # Empty ranges collapse to a point
+
+    dx, dy = np.roll(xs, -1, axis=1) - xs, np.roll(ys, -1, axis=1) - ys
+    x0, y0 = xs + t0 * dx, ys + t0 * dy
+    x1, y1 = xs + t1 * dx, ys + t1 * dy
+    return (x0 * y1 - x1 * y0).sum(axis=1)
+
+
+_SIGN_W = np.array([1.0, -1.0, -1.0, 1.0])
+_SIGN_H = np.array([1.0, 1.0, -1.0, -1.0])
+
+
+def intersection_area(boxes_a, boxes_b):
+    """
+    Intersection area of rotated boxes, row by row: boxes_a[i] with boxes_b[i].
+
+    The boundary of the overlap is made of the parts of A's edges inside B and the parts of B's
+    edges inside A. Each edge is clipped to the other rectangle with Liang-Barsky in that
+    rectangle's frame and the clipped pieces are summed with the shoelace formula (Green's
+    theorem), in B's frame.
+
+    Collinear edges would be counted twice (or, for boxes that only touch, once instead of
+    cancelling). A's edges are therefore clipped as if A were shrunk by a tiny tolerance and B's
+    edges against a likewise shrunk A, so a shared edge is only counted from A, and only when the
+    two interiors lie on the same side of it.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 5)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 5)
+    if len(boxes_a) == 0:
+        return np.zeros(0)
+
+    tol = 1e-6
+    shrunk_a = boxes_a.copy()
+    shrunk_a[:, 2:4] -= 2 * tol
+    half_wa, half_ha = shrunk_a[:, 2:3] / 2, shrunk_a[:, 3:4] / 2
+    half_wb, half_hb = boxes_b[:, 2:3] / 2, boxes_b[:, 3:4] / 2
+
+    # Everything is measured in B's frame, where B is axis aligned
+    xa, ya = _local_corners(boxes_a, boxes_b)
+    clip_xa, clip_ya = _local_corners(shrunk_a, boxes_b)
+    xb, yb = _SIGN_W * half_wb, _SIGN_H * half_hb
+    # B's corners in A's frame, to clip B's edges against A
+    along_b, across_b = _local_corners(boxes_b, boxes_a)
+
+    twice_area = (_boundary_inside(xa, ya, clip_xa, clip_ya, half_wb, half_hb)
+                  + _boundary_inside(xb, yb, along_b, across_b, half_wa, half_ha))
+    return 0.5 * np.abs(twice_area)
+
+
+def iou_pairs(boxes_a, boxes_b):
+    # Rotated IoU, row by row
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 5)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 5)
+    inter = intersection_area(boxes_a, boxes_b)
+    union = boxes_a[:, 2] * boxes_a[:, 3] + boxes_b[:, 2] * boxes_b[:, 3] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    (N, M) rotated IoU between two sets of xywhr boxes. Pairs whose circumscribed circles do not
+    touch are skipped without computing their polygon overlap.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 5)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 5)
+    ious = np.zeros((len(boxes_a), len(boxes_b)))
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return ious
+
+    distance = np.hypot(boxes_a[:, None, 0] - boxes_b[None, :, 0], boxes_a[:, None, 1] - boxes_b[None, :, 1])
+    reach = circumradius(boxes_a)[:, None] + circumradius(boxes_b)[None, :]
+    rows, cols = np.nonzero(distance < reach)
+    if len(rows):
+        ious[rows, cols] = iou_pairs(boxes_a[rows], boxes_b[cols])
+    return ious
+
+
+def rotated_nms(boxes, scores, iou_threshold=0.5, class_ids=None):
+    """
+    Greedy non-maximum suppression on xywhr boxes with rotated IoU. Boxes of different
+    `class_ids` never suppress each other. Returns the kept indices, highest score first.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+    if len(order) < 2:
+        return order
+
+    ious = iou_matrix(boxes[order], boxes[order])
+    if class_ids is not None:
+        classes = np.asarray(class_ids)[order]
+        ious[classes[:, None] != classes[None, :]] = 0.0
+    suppressed = np.zeros(len(order), dtype=bool)
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        # Everything after i scores lower; i suppresses its overlaps among them
+        suppressed[i + 1:] |= ious[i, i + 1:] > iou_threshold
+    return order[~suppressed]
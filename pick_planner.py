@@ -0,0 +1,186 @@
+import numpy as np
+
+from detections import class_names
+from obb_geometry import as_boxes, circumradius, intersection_area
+
+# One row per ranked pick candidate, best first
+PICK_DTYPE = np.dtype([
+    ("index", "<i4"),         # Row in the detection array
+    ("score", "<f4"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("grasp_angle", "<f4"),   # Closing direction of the gripper fingers, radians
+    ("occlusion", "<f4"),     # Fraction of the part covered by neighbours judged to lie on top
+    ("collision", "<f4"),     # Fraction of the finger footprint overlapping neighbouring parts
+    ("neighbors", "<i4"),     # Parts within reach of the footprint
+])
+
+
+class SpatialGrid:
+    """
+    Uniform grid over box centers for fixed-radius neighbour queries.
+
+    Centers are bucketed into square cells at least as large as the search radius, so all
+    neighbours of a point lie in its own or one of the eight surrounding cells. Buckets are kept
+    as a sorted key array, which lets the candidate pairs of all points be generated with a handful
+    of vectorized numpy calls instead of a Python loop per box.
+    """
+
+    def __init__(self, centers, cell_size):
+        self.centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = max(float(cell_size), 1e-6)
+        cells = np.floor(self.centers / self.cell_size).astype(np.int64)
+        self._origin = cells.min(axis=0) - 1 if len(cells) else np.zeros(2, dtype=np.int64)
+        cells -= self._origin
+        self._stride = int(cells[:, 1].max()) + 2 if len(cells) else 1
+        self._cells = cells
+        keys = cells[:, 0] * self._stride + cells[:, 1]
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+    def pairs(self, radius=None):
+        """
+        Return index arrays (i, j) with i < j of all center pairs in neighbouring cells, filtered
+        to center distance <= radius when given.
+        """
+        count = len(self.centers)
+        if count < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        # Keys of the 3 x 3 block of cells around every point, looked up in one pass
+        offsets = np.array([dx * self._stride + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        own_keys = self._cells[:, 0] * self._stride + self._cells[:, 1]
+        keys = (own_keys[:, None] + offsets[None, :]).ravel()
+        starts = np.searchsorted(self._sorted_keys, keys, side="left")
+        counts = np.searchsorted(self._sorted_keys, keys, side="right") - starts
+        total = int(counts.sum())
+
+        # Expand each [start, end) range without a Python loop
+        i = np.repeat(np.arange(count).repeat(len(offsets)), counts)
+        slots = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = self._order[np.repeat(starts, counts) + slots]
+        keep = i < j
+        i, j = i[keep], j[keep]
+        if radius is not None:
+            delta = self.centers[i] - self.centers[j]
+            close = np.einsum("ij,ij->i", delta, delta) <= np.square(radius)
+            i, j = i[close], j[close]
+        return i, j
+
+
+def gripper_footprints(boxes, finger_width=20.0, finger_depth=10.0):
+    """
+    Rectangles swept by a parallel gripper closing across each part's short side.
+
+    The footprint is centered on the part, `finger_width` long along the part's long axis and as
+    wide as the short side plus a finger on each side.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    long_is_w = boxes[:, 2] >= boxes[:, 3]
+    short_side = np.where(long_is_w, boxes[:, 3], boxes[:, 2])
+    angle = np.where(long_is_w, boxes[:, 4], boxes[:, 4] + np.pi / 2)  # Direction of the long axis
+    footprints = np.empty_like(boxes)
+    footprints[:, :2] = boxes[:, :2]
+    footprints[:, 2] = finger_width
+    footprints[:, 3] = short_side + 2 * finger_depth
+    footprints[:, 4] = angle
+    return footprints
+
+
+def plan_picks(dets, finger_width=20.0, finger_depth=10.0, min_confidence=0.0, max_picks=None):
+    """
+    Rank detections as pick targets, best first.
+
+    Args:
+        dets: DETECTION_DTYPE array from detections.to_numpy().
+        finger_width: Gripper finger width along the part's long axis, in pixels.
+        finger_depth: Space each finger needs beside the part, in pixels.
+        min_confidence: Detections below this confidence are not considered.
+        max_picks: Return at most this many picks.
+    Returns:
+        PICK_DTYPE array sorted by descending score.
+
+    Parts that overlap are assumed to be stacked, with the more confident detection on top (the
+    lower one is partially hidden). A part's score is its confidence, reduced by how much of it is
+    covered by parts on top and by how much of the gripper footprint collides with neighbours.
+    """
+    candidates = np.nonzero(dets["confidence"] >= min_confidence)[0]
+    count = len(candidates)
+    picks = np.zeros(count, dtype=PICK_DTYPE)
+    if count == 0:
+        return picks
+
+    boxes = as_boxes(dets[candidates])
+    confidence = dets["confidence"][candidates].astype(np.float64)
+    footprints = gripper_footprints(boxes, finger_width, finger_depth)
+
+    # Any interaction needs the footprints (which contain the parts) to be within reach
+    reach = circumradius(footprints)
+    grid = SpatialGrid(boxes[:, :2], cell_size=2 * reach.max())
+    i, j = grid.pairs()
+    near = np.hypot(*(boxes[i, :2] - boxes[j, :2]).T) <= reach[i] + reach[j]
+    i, j = i[near], j[near]
+
+    area = np.maximum(boxes[:, 2] * boxes[:, 3], 1e-9)
+    occlusion = np.zeros(count)
+    collision = np.zeros(count)
+    if len(i):
+        # Part/part overlap for every pair plus the finger footprint of each part against the
+        # other part's body in both directions, measured in a single vectorized call
+        rows = np.concatenate([i, i, j])
+        others = np.concatenate([j, j, i])
+        subject = np.concatenate([boxes[i], footprints[i], footprints[j]])
+        overlap = intersection_area(subject, boxes[others])
+        pairs = len(i)
+
+        # Part/part overlap is charged to whichever of the two is less confident
+        below = np.where(confidence[i] <= confidence[j], i, j)
+        occlusion = np.bincount(below, weights=overlap[:pairs], minlength=count) / area
+
+        blocked = overlap[pairs:]
+        # The fingers' area is the footprint minus the part itself (which may stick out of it)
+        finger_area = np.maximum(footprints[:, 2] * footprints[:, 3] - intersection_area(footprints, boxes), 1e-9)
+        collision = np.bincount(rows[pairs:], weights=blocked, minlength=count) / finger_area
+        neighbors = np.bincount(rows[pairs:], weights=blocked > 0, minlength=count)
+    else:
+        neighbors = np.zeros(count)
+
+    occlusion = np.clip(occlusion, 0.0, 1.0)
+    collision = np.clip(collision, 0.0, 1.0)
+    score = confidence * (1.0 - occlusion) * (1.0 - collision)
+
+    picks["index"] = candidates
+    picks["score"] = score
+    picks["x"] = boxes[:, 0]
+    picks["y"] = boxes[:, 1]
+    picks["grasp_angle"] = footprints[:, 4] + np.pi / 2  # Fingers close across the long axis
+    picks["occlusion"] = occlusion
+    picks["collision"] = collision
+    picks["neighbors"] = neighbors
+
+    ranked = picks[np.argsort(-score, kind="stable")]
+    return ranked if max_picks is None else ranked[:max_picks]
+
+
+def picks_to_records(picks, dets, names):
+    """
+    Convert ranked picks into JSON-ready dicts, the "picks" field of a detection record.
+    """
+    names = class_names(names)
+    records = []
+    for rank, pick in enumerate(picks.tolist()):
+        index, score, x, y, grasp_angle, occlusion, collision, neighbors = pick
+        records.append({
+            "rank": rank,
+            "index": index,
+            "class": names[dets["class_id"][index]],
+            "x": x,
+            "y": y,
+            "grasp_angle": grasp_angle,
+            "score": score,
+            "occlusion": occlusion,
+            "collision": collision,
+            "neighbors": neighbors,
+        })
+    return records
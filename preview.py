@@ -0,0 +1,95 @@
+import time
+import tkinter as tk
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from detections import class_names
+from obb_geometry import as_boxes, obb_corners
+
+# BGR colours cycled per class id
+CLASS_COLORS = [(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+                (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0)]
+
+
+def draw_obb_overlay(image, dets, scale_x=1.0, scale_y=1.0, names=None, thickness=1):
+    """
+    Draw oriented boxes (DETECTION_DTYPE) onto `image` in place, scaling frame coordinates by
+    (scale_x, scale_y) so boxes can be drawn straight onto a downscaled preview.
+    """
+    if len(dets) == 0:
+        return image
+    corners = obb_corners(as_boxes(dets))
+    corners[..., 0] *= scale_x
+    corners[..., 1] *= scale_y
+    corners = np.round(corners).astype(np.int32)
+    names = class_names(names) if names is not None else None
+
+    for polygon, class_id, conf in zip(corners, dets["class_id"].tolist(), dets["confidence"].tolist()):
+        color = CLASS_COLORS[class_id % len(CLASS_COLORS)]
+        cv2.polylines(image, [polygon], True, color, thickness, cv2.LINE_AA)
+        if names is not None:
+            x, y = polygon[:, 0].min(), polygon[:, 1].min()
+            cv2.putText(image, f"{names[class_id]} {conf:.2f}", (int(x), int(y) - 2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.35, color, 1, cv2.LINE_AA)
+    return image
+
+
+class PreviewRenderer:
+    """
+    Shows frames on a Tk canvas through one canvas item and one PhotoImage.
+
+    Frames are resized into a preallocated preview-sized buffer, overlays are drawn at preview
+    scale, and the result is pasted into the existing PhotoImage; no widgets or canvas items are
+    created per frame. `max_fps` caps how often non-forced renders are applied.
+    """
+
+    def __init__(self, canvas, width=640, height=360, max_fps=30, x=0, y=0):
+        self.width = width
+        self.height = height
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.frames_rendered = 0
+
+        self._small = np.zeros((height, width, 3), dtype=np.uint8)
+        # RGBA so PIL can map the array directly (3-byte RGB would be copied on creation)
+        self._rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        # Shares memory with self._rgba, so it always shows the latest converted frame
+        self._image = Image.frombuffer("RGBA", (width, height), self._rgba, "raw", "RGBA", 0, 1)
+        self._photo = ImageTk.PhotoImage(self._image)
+        self._canvas = canvas
+        self._item = canvas.create_image(x, y, anchor=tk.NW, image=self._photo)
+        self._last_render = 0.0
+
+    def render(self, frame, dets=None, names=None, force=False):
+        """
+        Draw `frame` (BGR) with optional OBB detections. Returns False if skipped by the rate cap.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_render < self.min_interval:
+            return False
+        self._last_render = now
+
+        height, width = frame.shape[:2]
+        cv2.resize(frame, (self.width, self.height), dst=self._small, interpolation=cv2.INTER_LINEAR)
+        if dets is not None:
+            draw_obb_overlay(self._small, dets, self.width / width, self.height / height, names)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        self._photo.paste(self._image)
+        self.frames_rendered += 1
+        return True
+
+    def clear(self):
+        self._rgba[..., :3] = 0
+        self._photo.paste(self._image)
+
+    def move(self, x, y):
+        self._canvas.coords(self._item, x, y)
+
+    def lift(self):
+        # Bring this preview above others sharing the canvas
+        self._canvas.tag_raise(self._item)
+
+    def close(self):
+        # Remove the canvas item; the renderer must not be used afterwards
+        self._canvas.delete(self._item)
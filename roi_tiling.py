@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+
+from detections import DETECTION_DTYPE, to_numpy
+from obb_geometry import as_boxes, rotated_nms
+
+
+def parse_roi(text):
+    # "x,y,w,h" in frame pixels, as given on the command line
+    x, y, w, h = (int(v) for v in text.split(","))
+    return x, y, w, h
+
+
+def tile_starts(start, length, tile, overlap):
+    """
+    Start offsets of tiles of size `tile` covering [start, start + length) with at least
+    `overlap` (fraction of a tile) shared between neighbours. The tiles are spread evenly, so
+    the last one ends exactly at the edge.
+    """
+    if tile >= length:
+        return [start]
+    stride = tile * (1.0 - overlap)
+    count = math.ceil((length - tile) / stride) + 1
+    return [start + int(round(i * (length - tile) / (count - 1))) for i in range(count)]
+
+
+class RoiTiler:
+    """
+    Runs the model on a region of interest instead of the whole frame, optionally split into
+    overlapping tiles so small parts keep their pixels at high camera resolutions.
+
+    `roi` is (x, y, w, h) in frame pixels (None for the whole frame) and `tile_size` the tile
+    edge in pixels (None for a single crop of the ROI). All crops of a frame go to the model as
+    one batch; they are views into the frame, not copies. Each tile only keeps boxes whose center
+    lies in the part of the tile it owns (up to the middle of the overlap with each neighbour),
+    so a part cut by one tile's border is taken from the neighbour that sees it whole; rotated
+    NMS then merges whatever duplicates are left. The tile windows only depend on the frame size,
+    so they are computed once per size and reused for every frame of a fixed camera mount.
+    """
+
+    def __init__(self, roi=None, tile_size=None, overlap=0.2, iou_threshold=0.5):
+        if not 0.0 <= overlap < 1.0:
+            raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+        self.roi = roi
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self._windows = {}  # (height, width) -> (windows, owned regions)
+
+    def windows(self, frame_shape):
+        """
+        Tile windows and their owned regions for a frame of `frame_shape`, as two (N, 4) int/float
+        arrays of (x0, y0, x1, y1) in frame pixels.
+        """
+        height, width = frame_shape[:2]
+        cached = self._windows.get((height, width))
+        if cached is not None:
+            return cached
+
+        x0, y0, x1, y1 = self.bounds(frame_shape)
+        tile_w = min(self.tile_size or (x1 - x0), x1 - x0)
+        tile_h = min(self.tile_size or (y1 - y0), y1 - y0)
+
+        columns = tile_starts(x0, x1 - x0, tile_w, self.overlap)
+        rows = tile_starts(y0, y1 - y0, tile_h, self.overlap)
+        owned_x = self._owned(columns, tile_w)
+        owned_y = self._owned(rows, tile_h)
+
+        windows = np.array([(cx, ry, cx + tile_w, ry + tile_h) for ry in rows for cx in columns], dtype=np.int64)
+        owned = np.array([(ox0, oy0, ox1, oy1) for oy0, oy1 in owned_y for ox0, ox1 in owned_x])
+        self._windows[(height, width)] = windows, owned
+        return windows, owned
+
+    def bounds(self, frame_shape):
+        # The ROI as (x0, y0, x1, y1), clipped to the frame so a resolution change cannot produce empty crops
+        height, width = frame_shape[:2]
+        x, y, w, h = self.roi if self.roi is not None else (0, 0, width, height)
+        x0, y0 = max(0, min(x, width - 1)), max(0, min(y, height - 1))
+        x1, y1 = max(x0 + 1, min(x + w, width)), max(y0 + 1, min(y + h, height))
+        return x0, y0, x1, y1
+
+    def clip(self, region, frame_shape):
+        # Part of a frame region (x0, y0, x1, y1) inside the ROI, or None if they do not overlap
+        rx0, ry0, rx1, ry1 = self.bounds(frame_shape)
+        x0, y0 = max(region[0], rx0), max(region[1], ry0)
+        x1, y1 = min(region[2], rx1), min(region[3], ry1)
+        return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+    @staticmethod
+    def _owned(starts, tile):
+        # Split every overlap in the middle; the outer tiles own everything beyond the ROI edge
+        bounds = [-np.inf] + [(following + previous + tile) / 2.0 for previous, following in zip(starts, starts[1:])] + [np.inf]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def crops(self, frame):
+        windows, _ = self.windows(frame.shape)
+        return [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in windows.tolist()]
+
+    def detect(self, model, frame, conf=0.8, **kwargs):
+        """
+        Run `model` on the ROI tiles of `frame` and return one DETECTION_DTYPE array in frame
+        coordinates, highest confidence first.
+        """
+        windows, owned = self.windows(frame.shape)
+        crops = self.crops(frame)
+        results = model(crops if len(crops) > 1 else crops[0], conf=conf, verbose=False, **kwargs)
+
+        kept = []
+        for result, (x0, y0, _, _), (ox0, oy0, ox1, oy1) in zip(results, windows.tolist(), owned.tolist()):
+            dets = to_numpy([result])
+            if len(dets) == 0:
+                continue
+            dets["x"] += x0
+            dets["y"] += y0
+            inside = (dets["x"] >= ox0) & (dets["x"] < ox1) & (dets["y"] >= oy0) & (dets["y"] < oy1)
+            kept.append(dets[inside])
+
+        if not kept:
+            return np.empty(0, dtype=DETECTION_DTYPE)
+        dets = np.concatenate(kept)
+        if len(windows) > 1:
+            dets = dets[rotated_nms(as_boxes(dets), dets["confidence"], self.iou_threshold, dets["class_id"])]
+        else:
+            dets = dets[np.argsort(-dets["confidence"], kind="stable")]
+        return dets
@@ -0,0 +1,44 @@
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import camera_probe
+
+
+class SlowSweepCapture:
+    # Opens and reads at once, but hangs on the first resolution change, like some UVC drivers
+    release_sweep = threading.Event()
+
+    def __init__(self, index, api):
+        self.index = index
+
+    def isOpened(self):
+        return self.index == 0
+
+    def read(self):
+        return True, np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: 640, cv2.CAP_PROP_FRAME_HEIGHT: 480, cv2.CAP_PROP_FPS: 30}[prop]
+
+    def set(self, prop, value):
+        self.release_sweep.wait(5.0)
+        return True
+
+    def release(self):
+        pass
+
+
+def test_a_camera_still_sweeping_resolutions_at_the_timeout_is_listed(monkeypatch):
+    monkeypatch.setattr(camera_probe.cv2, "VideoCapture", SlowSweepCapture)
+    try:
+        cameras = camera_probe.probe_cameras([0, 1], api=cv2.CAP_ANY, timeout=0.3)
+    finally:
+        SlowSweepCapture.release_sweep.set()
+    assert len(cameras) == 1
+    info = cameras[0]
+    assert (info.index, info.reads, info.resolution, info.resolutions) == (0, True, (640, 480), None)
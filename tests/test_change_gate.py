@@ -0,0 +1,57 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from change_gate import ChangeGate
+from detections import DETECTION_DTYPE
+
+# Part size of the current weight's parts in hasil.json, in frame pixels
+PART_SIZE = (53, 21)
+
+
+def bin_frame(width, height, parts, seed=0):
+    # Textured grey bin with filled rotated parts of the given grey levels
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 128, dtype=np.uint8)
+    frame = cv2.add(frame, rng.integers(0, 6, frame.shape, dtype=np.uint8))
+    for (x, y, angle), grey in parts:
+        corners = cv2.boxPoints(((x, y), PART_SIZE, angle)).astype(np.int32)
+        cv2.fillPoly(frame, [corners], (grey, grey, grey))
+    return frame
+
+
+def layout(width, height, grey):
+    rng = np.random.default_rng(1)
+    return [((float(rng.uniform(60, width - 60)), float(rng.uniform(60, height - 60)), float(rng.uniform(0, 180))),
+             grey) for _ in range(12)]
+
+
+@pytest.mark.parametrize("size", [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)])
+@pytest.mark.parametrize("grey", [20, 90, 170, 235])
+def test_removing_one_part_is_never_reused(size, grey):
+    width, height = size
+    parts = layout(width, height, grey)
+    gate = ChangeGate(min_part_size=PART_SIZE)
+    before = bin_frame(width, height, parts)
+    gate.update("cam0", before.shape, gate.thumbnail(before), np.empty(0, dtype=DETECTION_DTYPE))
+
+    for removed in range(len(parts)):
+        after = bin_frame(width, height, parts[:removed] + parts[removed + 1:])
+        decision, _ = gate.check(after, "cam0")
+        assert decision.action != "reuse", f"part {removed} removed but detections reused"
+
+
+@pytest.mark.parametrize("size", [(1280, 720), (1920, 1080)])
+def test_sensor_noise_is_reused(size):
+    width, height = size
+    parts = layout(width, height, 20)
+    gate = ChangeGate(min_part_size=PART_SIZE)
+    before = bin_frame(width, height, parts, seed=0)
+    gate.update("cam0", before.shape, gate.thumbnail(before), np.empty(0, dtype=DETECTION_DTYPE))
+
+    decision, _ = gate.check(bin_frame(width, height, parts, seed=1), "cam0")
+    assert decision.action == "reuse"
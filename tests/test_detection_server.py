@@ -0,0 +1,65 @@
+import asyncio
+import os
+import socket
+import struct
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection_server import FORMAT_BINARY, OP_DETECT, DetectionClient, DetectionServer, write_message
+from test_inference_worker import StubResult
+
+
+class CrowdedModel:
+    # A grid of well separated parts, so every response is larger than the socket buffers
+    names = {0: "part"}
+
+    def __init__(self, rows=200, cols=100):
+        x, y = np.meshgrid(np.arange(cols) * 100.0, np.arange(rows) * 100.0)
+        count = x.size
+        self.data = np.column_stack([x.ravel(), y.ravel(), np.full(count, 10.0), np.full(count, 5.0),
+                                     np.zeros(count), np.full(count, 0.9), np.zeros(count)])
+
+    def __call__(self, frames, **kwargs):
+        return [StubResult(self.data) for _ in (frames if isinstance(frames, list) else [frames])]
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_a_client_resetting_with_responses_pending_does_not_stop_the_server():
+    async def scenario():
+        server = DetectionServer(CrowdedModel(), port=0)
+        await server.start()
+        try:
+            image = cv2.imencode(".png", np.zeros((64, 64, 3), dtype=np.uint8))[1].tobytes()
+
+            # This client pipelines requests, never reads the answers and then resets the connection
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            sock.connect(("127.0.0.1", server.port))
+            _, writer = await asyncio.open_connection(sock=sock)
+            lock = asyncio.Lock()
+            for request_id in range(1, 4):
+                await write_message(writer, lock, OP_DETECT, request_id, FORMAT_BINARY, image)
+            # The server is stuck sending the first response
+            await wait_until(lambda: any(w.transport.get_write_buffer_size() for w in server._clients.values()))
+            writer.transport.abort()
+
+            async with DetectionClient("127.0.0.1", server.port) as client:
+                response = await asyncio.wait_for(client.detect(image, binary=True), 5.0)
+            assert len(response["detections"]) == len(server.model.data)
+            assert not server._worker.done()
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from change_gate import ChangeGate
+from inference_worker import InferenceWorker
+
+
+class StubBoxes:
+    # Just enough of ultralytics' OBB results for detections.to_numpy()
+    def __init__(self, data):
+        self.data = self
+        self._data = np.asarray(data, dtype=np.float32).reshape(-1, 7)
+
+    def __len__(self):
+        return len(self._data)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._data
+
+
+class StubResult:
+    def __init__(self, data):
+        self.obb = StubBoxes(data)
+
+
+class BlockingModel:
+    # Finds nothing, but holds every call until `release` is set
+    names = {0: "part"}
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, frames, **kwargs):
+        self.started.set()
+        self.release.wait(5.0)
+        return [StubResult([]) for _ in (frames if isinstance(frames, list) else [frames])]
+
+
+def wait_for_results(worker, count=1, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    results = []
+    while len(results) < count and time.monotonic() < deadline:
+        results.extend(worker.poll())
+        time.sleep(0.01)
+    return results
+
+
+def test_switching_the_gate_off_during_a_full_inference_keeps_the_worker_alive():
+    model = BlockingModel()
+    worker = InferenceWorker(model, "stub.pt", gate=ChangeGate())
+    try:
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        worker.submit(frame)
+        assert model.started.wait(5.0)
+        worker.gate = None  # What unticking "Skip unchanged frames" does
+        model.release.set()
+        assert len(wait_for_results(worker)) == 1
+
+        worker.submit(frame)
+        results = wait_for_results(worker)
+        assert len(results) == 1 and results[0].error is None
+        assert worker._thread.is_alive()
+    finally:
+        worker.stop()
+
+
+class LetterboxModel:
+    """
+    Resizes its input like ultralytics' letterbox (long side to imgsz) and finds bright blobs.
+    Blobs smaller than `small_area` input pixels are class 1, so the class depends on the scale
+    the model sees a part at, as with a real detector.
+    """
+    names = {0: "large", 1: "small"}
+
+    def __init__(self, small_area=1000):
+        self.small_area = small_area
+
+    def __call__(self, frames, conf=0.25, imgsz=640, **kwargs):
+        import cv2
+
+        results = []
+        for frame in frames if isinstance(frames, list) else [frames]:
+            ratio = min(imgsz / frame.shape[0], imgsz / frame.shape[1])
+            size = (max(1, round(frame.shape[1] * ratio)), max(1, round(frame.shape[0] * ratio)))
+            image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            mask = (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) > 100).astype(np.uint8)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            rows = []
+            for contour in contours:
+                (x, y), (w, h), angle = cv2.minAreaRect(contour)
+                class_id = 1 if w * h < self.small_area else 0
+                rows.append((x / ratio, y / ratio, w / ratio, h / ratio, np.deg2rad(angle), 0.9, class_id))
+            results.append(StubResult(rows))
+        return results
+
+
+def draw_part(frame, x, y, size=(53, 21)):
+    import cv2
+
+    corners = cv2.boxPoints(((x, y), size, 0.0)).astype(np.int32)
+    cv2.fillPoly(frame, [corners], (255, 255, 255))
+
+
+def test_region_and_full_inference_agree_on_an_unchanged_part():
+    worker = InferenceWorker(LetterboxModel(), "stub.pt", gate=ChangeGate())
+    try:
+        before = np.zeros((720, 1280, 3), dtype=np.uint8)
+        for x, y in ((200, 200), (640, 360), (1000, 500)):
+            draw_part(before, x, y)
+        worker.submit(before)
+        (full,) = wait_for_results(worker)
+        assert full.gate == "full"
+
+        # A part dropped next to the middle one: only that area is detected again
+        after = before.copy()
+        draw_part(after, 640, 400)
+        worker.submit(after)
+        (region,) = wait_for_results(worker)
+        assert region.gate == "region"
+
+        def nearest(dets, x, y):
+            return dets[np.argmin(np.hypot(dets["x"] - x, dets["y"] - y))]
+
+        expected, actual = nearest(full.dets, 640, 360), nearest(region.dets, 640, 360)
+        assert actual["class_id"] == expected["class_id"]
+        for field in ("x", "y", "w", "h"):
+            assert abs(float(actual[field]) - float(expected[field])) <= 3.0
+    finally:
+        worker.stop()
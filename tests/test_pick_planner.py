@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detections import DETECTION_DTYPE
+from pick_planner import plan_picks
+
+
+def parts(rows):
+    dets = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for det, (x, y, w, h, r) in zip(dets, rows):
+        det["x"], det["y"], det["w"], det["h"], det["r"] = x, y, w, h, r
+        det["confidence"] = 0.9
+    return dets
+
+
+def test_neighbour_a_few_pixels_away_reduces_but_keeps_the_score():
+    # Two 53x21 parts side by side, 4 px apart across their short sides
+    dets = parts([(100.0, 100.0, 53.0, 21.0, 0.0), (100.0, 125.0, 53.0, 21.0, 0.0)])
+    picks = plan_picks(dets, finger_width=20.0, finger_depth=10.0)
+
+    # Each finger on the inner side reaches 6 px into the neighbour over its 20 px width
+    assert np.allclose(picks["collision"], 6 * 20 / (20 * 2 * 10), atol=0.01)
+    assert np.all(picks["score"] > 0.0)
+    assert np.all(picks["score"] < 0.9)
+
+
+def test_isolated_part_ranks_first():
+    dets = parts([(100.0, 100.0, 53.0, 21.0, 0.0), (100.0, 125.0, 53.0, 21.0, 0.0), (300.0, 300.0, 53.0, 21.0, 0.3)])
+    picks = plan_picks(dets)
+
+    assert picks["index"][0] == 2
+    assert picks["collision"][0] == 0.0
+    assert picks["score"][0] > picks["score"][1] > 0.0
@@ -1,11 +1,14 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk, filedialog
 import cv2
-from ultralytics import YOLO
-from threading import Thread
 from PIL import Image, ImageTk
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import ModelRegistry
+
 class CameraApp:
     def __init__(self, root):
         self.root = root
@@ -14,8 +17,11 @@ class CameraApp:
         # Initialize variables
         self.image_path = None  # Variable to store the image path
         self.inferencing = False
-        self.model = YOLO("bestV3-OBB.pt")
         self.current_weight_path = "bestV3-OBB.pt"  # Default weight path
+        # Keeps recently compared weights loaded so switching back is instant
+        self.model_registry = ModelRegistry(max_models=4)
+        self.model = self.model_registry.load(self.current_weight_path).result()
+        self.pending_weight_path = None
 
         # Create UI
         self.create_ui()
@@ -84,9 +90,27 @@ class CameraApp:
         # Open a file dialog to select a weight file
         file_path = filedialog.askopenfilename(filetypes=[("PyTorch Model Files", "*.pt")])
         if file_path:
-            self.current_weight_path = file_path
-            self.model = YOLO(file_path)  # Load the selected model file
+            # Load in the background; the current model stays active until the new one is warm
+            self.pending_weight_path = file_path
+            self.weight_label.config(text=f"Loading Weight: {file_path}")
+            self.poll_weight_load(self.model_registry.load(file_path), file_path)
+
+    def poll_weight_load(self, future, file_path):
+        if file_path != self.pending_weight_path:
+            return  # Superseded by a later selection
+        if not future.done():
+            self.root.after(50, self.poll_weight_load, future, file_path)
+            return
+
+        self.pending_weight_path = None
+        if future.exception() is not None:
+            print(f"Failed to load weight {file_path}: {future.exception()}")
             self.weight_label.config(text=f"Current Weight: {self.current_weight_path}")
+            return
+        self.model = future.result()
+        self.current_weight_path = file_path
+        self.weight_label.config(text=f"Current Weight: {self.current_weight_path}")
+        self.display_image()  # Re-run the shown image with the new weight
 
     def save_inference_to_json(self, results, output_file="hasil.json"):
         """
@@ -121,6 +145,7 @@ class CameraApp:
 
     def on_close(self):
         # Stop the application
+        self.model_registry.close()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,356 @@
+"""
+Headless comparison of several weights on a labeled image set.
+
+Labels use the ultralytics OBB format, one `<image stem>.txt` per image with one line per part:
+
+    class_index x1 y1 x2 y2 x3 y3 x4 y4      (corners normalized to the image size)
+
+They are looked up in `--labels`, else in the `labels` folder next to an `images` folder (the
+usual dataset layout), else next to the image. Images without a label file count as empty bins.
+
+Every image is decoded once into a shared memory block that all worker processes read from, and
+each weight runs in its own process. Detections and latencies are cached per (weight hash, image
+hash) under `--cache`, so a rerun only evaluates the weights and images that changed. Detections
+are kept down to `--min-conf` for the mAP; precision and recall are reported at `--conf`, the
+threshold the app uses.
+
+Example:
+    python tools/compare_weights.py dataset/images/val --weights weights/bestV3-OBB.pt weights/bestV4-OBB.pt
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_detect import iter_image_files
+from inference_backends import BACKENDS, weight_hash
+from obb_geometry import as_boxes, iou_matrix
+
+CACHE_DIR = ".compare_cache"
+IOU_THRESHOLDS = np.round(np.arange(0.5, 0.96, 0.05), 2)
+# Ground truth boxes, as (x, y, w, h, r) in pixels plus the class index
+LABEL_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("w", "<f4"), ("h", "<f4"), ("r", "<f4"), ("class_id", "<i4")])
+
+
+def label_path(image_path, labels_dir=None):
+    stem = os.path.splitext(os.path.basename(image_path))[0] + ".txt"
+    if labels_dir:
+        return os.path.join(labels_dir, stem)
+    directory = os.path.dirname(os.path.abspath(image_path))
+    parts = directory.split(os.sep)
+    if "images" in parts:
+        # dataset/images/val/x.png -> dataset/labels/val/x.txt
+        at = len(parts) - 1 - parts[::-1].index("images")
+        candidate = os.path.join(os.sep.join(parts[:at] + ["labels"] + parts[at + 1:]), stem)
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join(directory, stem)
+
+
+def read_labels(path, width, height):
+    """
+    Read an ultralytics OBB label file into a LABEL_DTYPE array in pixels (empty if there is no file).
+    """
+    if not os.path.exists(path):
+        return np.empty(0, dtype=LABEL_DTYPE)
+    rows = []
+    with open(path, "r") as label_file:
+        for line in label_file:
+            values = line.split()
+            if len(values) != 9:
+                continue
+            corners = (np.array(values[1:], dtype=np.float32).reshape(4, 2) * (width, height)).astype(np.float32)
+            (x, y), (w, h), angle = cv2.minAreaRect(corners)
+            rows.append((x, y, w, h, np.deg2rad(angle), int(values[0])))
+    return np.array(rows, dtype=LABEL_DTYPE)
+
+
+def match_detections(dets, labels, thresholds=IOU_THRESHOLDS):
+    """
+    Greedily match one image's detections (highest confidence first) to same-class labels.
+    Returns a (len(dets), len(thresholds)) bool array marking the true positives.
+    """
+    order = np.argsort(-dets["confidence"], kind="stable")
+    hits = np.zeros((len(dets), len(thresholds)), dtype=bool)
+    if len(dets) == 0 or len(labels) == 0:
+        return hits
+    ious = iou_matrix(as_boxes(dets[order]), as_boxes(labels))
+    ious[dets["class_id"][order][:, None] != labels["class_id"][None, :]] = 0.0
+    for column, threshold in enumerate(thresholds):
+        taken = np.zeros(len(labels), dtype=bool)
+        for row in range(len(order)):
+            candidates = np.where(taken, 0.0, ious[row])
+            best = int(candidates.argmax())
+            if candidates[best] >= threshold:
+                taken[best] = True
+                hits[order[row], column] = True
+    return hits
+
+
+def average_precision(confidences, hits, positives):
+    # COCO-style 101-point interpolated area under the precision/recall curve
+    if positives == 0:
+        return float("nan")
+    if len(confidences) == 0:
+        return 0.0
+    order = np.argsort(-confidences, kind="stable")
+    true_positives = np.cumsum(hits[order])
+    precision = true_positives / np.arange(1, len(order) + 1)
+    recall = true_positives / positives
+    # Precision envelope: best precision at this recall or beyond
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    points = np.linspace(0.0, 1.0, 101)
+    at = np.searchsorted(recall, points, side="left")
+    return float(np.where(at < len(precision), precision[np.minimum(at, len(precision) - 1)], 0.0).mean())
+
+
+def evaluate(image_dets, image_labels, names, conf=0.8):
+    """
+    Per-class precision/recall at `conf` and AP50 / AP50-95, plus their means over the classes
+    that have labels. `image_dets` and `image_labels` are lists with one array per image.
+    """
+    empty = np.empty(0, dtype=np.int32)
+    confidences = np.concatenate([dets["confidence"] for dets in image_dets] + [np.empty(0, dtype=np.float32)])
+    class_ids = np.concatenate([dets["class_id"] for dets in image_dets] + [empty])
+    label_ids = np.concatenate([labels["class_id"] for labels in image_labels] + [empty])
+    hits = np.concatenate([match_detections(dets, labels) for dets, labels in zip(image_dets, image_labels)]
+                          + [np.empty((0, len(IOU_THRESHOLDS)), dtype=bool)])
+    classes = sorted(set(class_ids.tolist()) | set(label_ids.tolist()))
+
+    per_class = {}
+    for class_id in classes:
+        selected = class_ids == class_id
+        positives = int((label_ids == class_id).sum())
+        kept = selected & (confidences >= conf)
+        true_positives = int(hits[kept, 0].sum())
+        aps = [average_precision(confidences[selected], hits[selected, column], positives)
+               for column in range(len(IOU_THRESHOLDS))]
+        name = str(names[class_id]) if 0 <= class_id < len(names) else str(class_id)
+        per_class[name] = {
+            "labels": positives,
+            "detections": int(kept.sum()),
+            "precision": true_positives / int(kept.sum()) if kept.any() else 0.0,
+            "recall": true_positives / positives if positives else float("nan"),
+            "ap50": aps[0],
+            "ap50_95": float(np.mean(aps)) if positives else float("nan"),
+        }
+
+    labeled = [stats for stats in per_class.values() if stats["labels"]]
+    summary = {key: float(np.mean([stats[key] for stats in labeled])) if labeled else float("nan")
+               for key in ("precision", "recall", "ap50", "ap50_95")}
+    summary["classes"] = per_class
+    return summary
+
+
+class DetectionCache:
+    """
+    Detections and latency of one weight (and inference settings) per image hash, stored as one
+    .npz file per weight.
+    """
+
+    def __init__(self, cache_dir, weight_hash, settings):
+        self.path = os.path.join(cache_dir, f"{weight_hash}-{settings}.npz")
+        self.entries = {}  # image hash -> (DETECTION_DTYPE array, latency in ms)
+        self.names = None
+        if os.path.exists(self.path):
+            with np.load(self.path) as stored:
+                self.names = [str(name) for name in stored["names"]]
+                for key in stored.files:
+                    if key.startswith("dets_"):
+                        image_hash = key[len("dets_"):]
+                        self.entries[image_hash] = stored[key], float(stored[f"ms_{image_hash}"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        arrays = {"names": np.array(self.names or [], dtype=str)}
+        for image_hash, (dets, latency) in self.entries.items():
+            arrays[f"dets_{image_hash}"] = dets
+            arrays[f"ms_{image_hash}"] = np.float64(latency)
+        temporary = self.path + ".tmp.npz"
+        np.savez(temporary, **arrays)
+        os.replace(temporary, self.path)
+
+
+class SharedImages:
+    """
+    Decoded images packed into one shared memory block. Workers attach by name and get views,
+    so every weight reads the same pixels without copying or decoding them again.
+    """
+
+    def __init__(self, images):
+        # images: {image hash: BGR array}
+        self.layout = {}
+        offset = 0
+        for image_hash, image in images.items():
+            self.layout[image_hash] = (offset, image.shape)
+            offset += image.nbytes
+        self.block = shared_memory.SharedMemory(create=True, size=max(1, offset))
+        for image_hash, image in images.items():
+            view = self.view(self.block, image_hash, self.layout)
+            view[...] = image
+
+    @staticmethod
+    def view(block, image_hash, layout):
+        offset, shape = layout[image_hash]
+        return np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+
+def run_weight(weight_path, backend, block_name, layout, image_hashes, min_conf, imgsz, threads, warmup):
+    """
+    Worker process: run one weight over the shared images and return its class names and
+    {image hash: (detections, latency in ms)}.
+    """
+    from detections import class_names, to_numpy
+    from inference_backends import load_model
+
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        model = load_model(weight_path, backend, threads=threads, imgsz=imgsz)
+        names = [str(name) for name in class_names(model.names)]
+        entries = {}
+        for position, image_hash in enumerate(image_hashes):
+            image = SharedImages.view(block, image_hash, layout)
+            if position == 0:
+                for _ in range(warmup):
+                    model(image, conf=min_conf, imgsz=imgsz, verbose=False)
+            start = time.perf_counter()
+            results = model(image, conf=min_conf, imgsz=imgsz, verbose=False)
+            latency = (time.perf_counter() - start) * 1000.0
+            entries[image_hash] = to_numpy(results), latency
+            del image  # Release the view before the block is closed
+        return names, entries
+    finally:
+        block.close()
+
+
+def image_size(path):
+    # (height, width) from the file header, without decoding the pixels
+    with Image.open(path) as image:
+        return image.height, image.width
+
+
+def decode_images(paths, threads=4):
+    # cv2 releases the GIL while decoding, so a thread pool decodes in parallel
+    with ThreadPoolExecutor(threads) as pool:
+        return dict(zip(paths, pool.map(cv2.imread, paths)))
+
+
+def compare_weights(image_paths, weight_paths, backend="torch", conf=0.8, min_conf=0.05, imgsz=640,
+                    workers=None, labels_dir=None, cache_dir=CACHE_DIR, warmup=1):
+    """
+    Evaluate every weight on `image_paths` and return a report dict with one entry per weight.
+    """
+    settings = f"{backend}-{imgsz}-{min_conf:g}"
+    image_hashes = {path: weight_hash(path) for path in image_paths}
+    caches = {weight_path: DetectionCache(cache_dir, weight_hash(weight_path), settings) for weight_path in weight_paths}
+    missing = {weight_path: [path for path in image_paths if image_hashes[path] not in cache.entries]
+               for weight_path, cache in caches.items()}
+    needed = sorted({path for paths in missing.values() for path in paths})
+
+    # Only images some weight still has to run on are decoded; the others just need their size
+    decoded = decode_images(needed)
+    unreadable = [path for path, image in decoded.items() if image is None]
+    for path in unreadable:
+        print(f"Failed to read {path}, skipping")
+    image_paths = [path for path in image_paths if path not in unreadable]
+    sizes = {path: decoded[path].shape[:2] if path in decoded else image_size(path) for path in image_paths}
+
+    pending = {weight_path: [path for path in paths if path not in unreadable] for weight_path, paths in missing.items()}
+    pending = {weight_path: paths for weight_path, paths in pending.items() if paths}
+    if pending:
+        workers = workers or min(len(pending), max(1, (os.cpu_count() or 2) // 2))
+        threads = max(1, (os.cpu_count() or 2) // workers)
+        shared = SharedImages({image_hashes[path]: decoded[path]
+                               for path in sorted({path for paths in pending.values() for path in paths})})
+        print(f"Evaluating {sum(len(paths) for paths in pending.values())} (weight, image) pair(s) "
+              f"on {workers} worker process(es)")
+        try:
+            # spawn: the same on Windows and Linux, and no torch state is forked into the workers
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                futures = {weight_path: pool.submit(run_weight, weight_path, backend, shared.block.name, shared.layout,
+                                                    [image_hashes[path] for path in paths], min_conf, imgsz, threads,
+                                                    warmup)
+                           for weight_path, paths in pending.items()}
+                for weight_path, future in futures.items():
+                    names, entries = future.result()
+                    cache = caches[weight_path]
+                    cache.names = names
+                    cache.entries.update(entries)
+                    cache.save()
+        finally:
+            shared.close()
+    else:
+        print("All (weight, image) pairs found in the cache")
+
+    labels = [read_labels(label_path(path, labels_dir), sizes[path][1], sizes[path][0]) for path in image_paths]
+    report = {"created": time.time(), "backend": backend, "conf": conf, "min_conf": min_conf, "imgsz": imgsz,
+              "images": len(image_paths), "labels": int(sum(len(image_labels) for image_labels in labels)),
+              "weights": []}
+    for weight_path, cache in caches.items():
+        dets = [cache.entries[image_hashes[path]][0] for path in image_paths]
+        latencies = np.array([cache.entries[image_hashes[path]][1] for path in image_paths])
+        result = evaluate(dets, labels, cache.names or [], conf=conf)
+        result["weight_path"] = weight_path
+        result["latency_ms"] = {
+            "mean": float(latencies.mean()) if len(latencies) else float("nan"),
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else float("nan"),
+            "p95": float(np.percentile(latencies, 95)) if len(latencies) else float("nan"),
+        }
+        report["weights"].append(result)
+    return report
+
+
+def print_report(report):
+    print(f"{report['images']} image(s), {report['labels']} labeled part(s), precision/recall at conf {report['conf']}")
+    print(f"{'weight':40s} {'P':>6s} {'R':>6s} {'mAP50':>7s} {'mAP50-95':>9s} {'ms p50':>8s} {'ms p95':>8s}")
+    for result in report["weights"]:
+        latency = result["latency_ms"]
+        print(f"{result['weight_path'][-40:]:40s} {result['precision']:6.3f} {result['recall']:6.3f} "
+              f"{result['ap50']:7.3f} {result['ap50_95']:9.3f} {latency['p50']:8.1f} {latency['p95']:8.1f}")
+        for name, stats in result["classes"].items():
+            print(f"    {name[:36]:36s} {stats['precision']:6.3f} {stats['recall']:6.3f} "
+                  f"{stats['ap50']:7.3f} {stats['ap50_95']:9.3f}   ({stats['labels']} labels)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YOLO OBB weights on a labeled image set.")
+    parser.add_argument("images", help="Folder of labeled images")
+    parser.add_argument("--weights", nargs="+", required=True, help="Weight files to compare")
+    parser.add_argument("--labels", help="Folder of label files (default: next to the images)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime")
+    parser.add_argument("--conf", type=float, default=0.8, help="Confidence threshold for precision and recall")
+    parser.add_argument("--min-conf", type=float, default=0.05, help="Lowest confidence kept for the mAP")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per weight, up to half the CPUs)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Folder of cached detections")
+    parser.add_argument("--output", default="compare_weights.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    image_paths = list(iter_image_files(args.images))
+    if not image_paths:
+        print(f"No images found in {args.images}")
+        sys.exit(1)
+    report = compare_weights(image_paths, args.weights, backend=args.backend, conf=args.conf, min_conf=args.min_conf,
+                             imgsz=args.imgsz, workers=args.workers, labels_dir=args.labels, cache_dir=args.cache)
+    print_report(report)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=4)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk
-import cv2
 from ultralytics import YOLO
-from threading import Thread
-from PIL import Image, ImageTk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera_probe import probe_cameras
+from detections import class_names
+from frame_source import CaptureThread
+from inference_worker import InferenceWorker
+from preview import PreviewRenderer
 
 class CameraApp:
     def __init__(self, root):
@@ -15,9 +21,15 @@ class CameraApp:
         self.current_camera_index = 1  # Default to the second camera
         self.running = False
         self.inferencing = False
-        self.cap = None
+        self.capture = None
+        self.last_frame_index = -1
+        self.update_job = None  # Pending root.after callback of the preview loop
         self.weight_path = "bestV3-OBB.pt"
         self.model = YOLO(self.weight_path)
+        self.class_names = class_names(self.model.names)
+        # Inference runs on a worker thread so the preview keeps updating; update_frame polls the results
+        self.inference_worker = InferenceWorker(self.model, self.weight_path, conf=0.8)
+        self.latest_dets = None  # Detections of the most recent finished job, drawn on every frame
 
         # Create UI
         self.create_ui()
@@ -55,48 +67,19 @@ class CameraApp:
         # Canvas to show the camera feed
         self.canvas = tk.Canvas(self.root, width=640, height=360)  # Adjusted to 16:9 aspect ratio
         self.canvas.pack(side=tk.LEFT, padx=10, pady=10)
+        self.preview = PreviewRenderer(self.canvas, 640, 360, max_fps=30)
 
     def get_available_cameras(self):
         """
-        Check for available cameras using port testing.
+        Check for available cameras by probing all device ports concurrently.
         """
-        available_ports, working_ports, non_working_ports = self.list_ports()
-        
-        # Combine working and available ports
-        camera_ports = working_ports
-        
+        # Only cameras that actually deliver frames are offered
+        camera_ports = [info.index for info in probe_cameras() if info.reads]
+
         # Convert port numbers to camera names
         cameras = [f"Camera {port}" for port in camera_ports]
         return cameras
     
-
-    def list_ports(self):
-        """
-        Test the ports and returns a tuple with the available ports and the ones that are working.
-        """
-        non_working_ports = []
-        dev_port = 0
-        working_ports = []
-        available_ports = []
-        while len(non_working_ports) < 6:  # if there are more than 5 non working ports stop the testing. 
-            camera = cv2.VideoCapture(dev_port, cv2.CAP_DSHOW)
-            if not camera.isOpened():
-                non_working_ports.append(dev_port)
-            else:
-                is_reading, img = camera.read()
-                w = camera.get(3)
-                h = camera.get(4)
-                if is_reading:
-                    print(f"Camera {dev_port} is working and reads images ({h} x {w})")
-                    working_ports.append(dev_port)
-                else:
-                    print(f"Camera {dev_port} for camera ({h} x {w}) is present but does not read.")
-                    available_ports.append(dev_port)
-                camera.release()
-            dev_port += 1
-        return available_ports, working_ports, non_working_ports
-    
-    
     def on_camera_selected(self, event):
         # Handle camera selection change
         selected_index = self.camera_selector.current()
@@ -106,46 +89,51 @@ class CameraApp:
     def select_camera(self, index):
         # Stop current camera if running
         self.running = False
-        if self.cap:
-            self.cap.release()
+        if self.update_job:
+            self.root.after_cancel(self.update_job)
+            self.update_job = None
+        if self.capture:
+            self.capture.stop()
 
         self.current_camera_index = index
-        self.cap = cv2.VideoCapture(self.current_camera_index)  
-        if not self.cap.isOpened():
+        self.capture = CaptureThread(self.current_camera_index)
+        if not self.capture.start():
             print(f"Error: Cannot open camera {self.current_camera_index}")
             return
 
         self.running = True
-        Thread(target=self.update_frame, daemon=True).start()
+        self.last_frame_index = -1
+        self.update_job = self.root.after(0, self.update_frame)
 
     def update_frame(self):
-        while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Error: Failed to capture frame.")
-                break
-
-            if self.inferencing:
-                # Run YOLO inference and annotate the frame
-                results = self.model(frame, conf=0.8)
-                annotated_frame = results[0].plot(font_size=0.5)
-            else:
-                annotated_frame = frame
-
-            # Convert the frame to a format suitable for Tkinter
-            frame_resized = cv2.resize(annotated_frame, (640, 360))  # Resize to 16:9 aspect ratio
-            rgb_frame = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb_frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            # Display the frame on the canvas
-            self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
-            self.canvas.image = imgtk
+        # Runs on the Tk thread; frames are read by the capture thread
+        if not self.running:
+            return
+        latest = self.capture.latest()
+        if latest is not None and latest.index != self.last_frame_index:
+            self.last_frame_index = latest.index
+            frame = latest.image
+
+            if self.inferencing and self.inference_worker.is_idle():
+                self.inference_worker.submit(frame)
+
+            # Resize into the reused preview buffer and update the single canvas image;
+            # boxes are drawn at preview scale by the renderer
+            self.preview.render(frame, self.latest_dets if self.inferencing else None, self.class_names)
+
+        for result in self.inference_worker.poll():
+            if result.error is not None:
+                print(f"Inference failed: {result.error}")
+            elif self.inferencing:
+                self.latest_dets = result.dets
+                self.class_names = result.names
+        self.update_job = self.root.after(10, self.update_frame)
 
     def toggle_inference(self):
         # Toggle the inference state
         self.inferencing = not self.inferencing
         self.control_button.config(text="Stop Inference" if self.inferencing else "Start Inference")
+        self.latest_dets = None
 
     def select_weight(self):
         # Select a new weight file
@@ -155,12 +143,14 @@ class CameraApp:
             self.weight_path = weight_file
             self.weight_label.config(text=f"Weight: {self.weight_path}")
             self.model = YOLO(self.weight_path)
+            self.inference_worker.set_model(self.model, self.weight_path)
 
     def on_close(self):
         # Stop the application
         self.running = False
-        if self.cap:
-            self.cap.release()
+        if self.capture:
+            self.capture.stop()
+        self.inference_worker.stop()
         self.root.destroy()
 
 if __name__ == "__main__":